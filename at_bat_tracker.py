@@ -1,11 +1,18 @@
 import streamlit as st
-from streamlit_image_coordinates import streamlit_image_coordinates
-import matplotlib.pyplot as plt
-from matplotlib.lines import Line2D
-from PIL import Image
-from google.cloud import bigquery
-from google.oauth2 import service_account
+import time
 import uuid
+from compaction import get_compaction_job
+from concurrent_fetch import Fetch, fetch_concurrently
+from diagnostics import get_span_recorder, span
+from dimension_cache import FALLBACK_TTL_SECONDS, get_dimension_cache
+from game_session import GameSession
+from hit_cache import get_hit_cache
+from hit_journal import get_hit_journal
+from hitter_aggregates import SPRAY_BINS, get_aggregate_store
+from storage import get_storage, history_key, history_page, merged_history_page
+# matplotlib, PIL, numpy/pandas and the image-click component are imported
+# inside the stages that use them, so a session that only logs strikeouts
+# never loads them.
 
 # Helper to rerun the app if possible.
 def rerun_app():
@@ -19,104 +26,160 @@ def rerun_app():
         st.write("Changes have been saved to the database.")
 
 # =============================================================================
-# BigQuery helper functions for options, metrics, and hits
+# Storage helper functions for options, metrics, and hits
+# (backend is configured in storage.py; BigQuery by default)
 # =============================================================================
-def get_bigquery_client():
-    service_account_info = st.secrets["bigquery"]
-    credentials = service_account.Credentials.from_service_account_info(service_account_info)
-    return bigquery.Client(credentials=credentials, project=credentials.project_id)
-
+# Dimension lists are shared by every session through the process-wide cache.
 def load_opponent_options():
-    client = get_bigquery_client()
-    query = "SELECT opponent FROM hit-tracker-453205.hit_tracker_data.dim_opponents"
-    results = client.query(query).result()
-    return [row.opponent for row in results]
+    opponents = get_storage().load_opponents()
+    get_dimension_cache().put("opponents", opponents)
+    return opponents
 
 def load_hitter_options():
-    client = get_bigquery_client()
-    query = "SELECT hitter FROM hit-tracker-453205.hit_tracker_data.dim_hitters"
-    results = client.query(query).result()
-    return [row.hitter for row in results]
+    hitters = get_storage().load_hitters()
+    get_dimension_cache().put("hitters", hitters)
+    return hitters
 
 def save_opponent_to_bigquery(new_opponent):
-    client = get_bigquery_client()
-    table_id = "hit-tracker-453205.hit_tracker_data.dim_opponents"
-    row = {"opponent": new_opponent}
-    errors = client.insert_rows_json(table_id, [row])
+    errors = get_storage().save_opponent(new_opponent)
     if errors:
         st.error("Error saving opponent: " + str(errors))
+    else:
+        get_dimension_cache().add("opponents", new_opponent)
 
 def save_hitter_to_bigquery(new_hitter):
-    client = get_bigquery_client()
-    table_id = "hit-tracker-453205.hit_tracker_data.dim_hitters"
-    row = {"hitter": new_hitter}
-    errors = client.insert_rows_json(table_id, [row])
+    errors = get_storage().save_hitter(new_hitter)
     if errors:
         st.error("Error saving hitter: " + str(errors))
+    else:
+        get_dimension_cache().add("hitters", new_hitter)
 
 def log_to_bigquery(hit_info):
-    client = get_bigquery_client()
-    table_id = "hit-tracker-453205.hit_tracker_data.fact_hit_log"
-    errors = client.insert_rows_json(table_id, [hit_info])
-    if errors:
-        st.error(f"Error logging data: {errors}")
+    # Journaled locally and flushed to fact_hit_log in the background.
+    try:
+        get_hit_journal().append(hit_info)
+    except Exception as e:
+        st.error(f"Error logging data: {e}")
     else:
+        get_hit_cache().add_hit(hit_info)
+        get_aggregate_store().add_hits([hit_info])
         st.success("Hit logged!")
 
-def load_hits_for_player(hitter_name):
-    client = get_bigquery_client()
-    query = f"""
-        SELECT * FROM hit-tracker-453205.hit_tracker_data.fact_hit_log
-        WHERE hitter_name = '{hitter_name}'
-    """
-    results = client.query(query).result()
-    return [dict(row) for row in results]
-
-def load_all_metrics_for_player(hitter_name):
-    client = get_bigquery_client()
-    query = f"""
-        SELECT 
-          `Hard Hit %` as hard_hit, 
-          `Weak Hit %` as weak_hit,
-          `Fly Ball %` as fly,
-          `Line Drive %` as line,
-          `Ground Ball %` as ground
-        FROM `hit-tracker-453205.hit_tracker_data.vw_hitting_metrics`
-        WHERE hitter_name = '{hitter_name}'
-    """
-    results = client.query(query).result()
-    for row in results:
-        return row.hard_hit, row.weak_hit, row.fly, row.line, row.ground
-    return None, None, None, None, None
+def commit_at_bats(hits):
+    # A live-game batch: one journal transaction, flushed to fact_hit_log right away.
+    get_hit_journal().append_many(hits)
+    for hit_info in hits:
+        get_hit_cache().add_hit(hit_info)
+    get_aggregate_store().add_hits(hits)
 
-def delete_hit_from_bigquery(hit_id):
-    try:
-        client = get_bigquery_client()
-        query = f"""
-            DELETE FROM hit-tracker-453205.hit_tracker_data.fact_hit_log
-            WHERE id = '{hit_id}'
-        """
-        results = client.query(query).result()
+HISTORY_PAGE_SIZE = 20
+
+def load_hits_for_player(hitter_name):
+    cache = get_hit_cache()
+    hits = cache.get(hitter_name)
+    if hits is not None:
+        return hits
+    hits = get_storage().load_hits(hitter_name)
+    # Include at-bats that are still waiting in the local journal.
+    loaded_ids = {hit["id"] for hit in hits}
+    hits.extend(hit for hit in get_hit_journal().pending_rows(hitter_name)
+                if hit["id"] not in loaded_ids)
+    cache.put(hitter_name, hits)
+    return hits
+
+def load_history_page(hitter_name, cursor=None, page_size=HISTORY_PAGE_SIZE):
+    # One newest-first page of at-bats older than cursor (a history_key()).
+    cached = get_hit_cache().get(hitter_name)
+    if cached is not None:
+        return history_page(cached, page_size, cursor)
+    return merged_history_page(get_storage(), hitter_name, page_size, cursor,
+                               pending=get_hit_journal().pending_rows(hitter_name))
+
+def count_hits_for_player(hitter_name):
+    cached = get_hit_cache().get(hitter_name)
+    if cached is not None:
+        return len(cached)
+    return get_storage().count_hits(hitter_name) + len(get_hit_journal().pending_rows(hitter_name))
+
+def load_team_leaderboard():
+    # Every hitter's totals come straight from the pre-aggregated counters.
+    from hitting_metrics import counts_frame, leaderboard_table
+    return leaderboard_table(counts_frame(get_aggregate_store().all_totals()))
+
+def delete_hit_from_bigquery(hit):
+    # An at-bat that has not been flushed yet only needs to leave the journal;
+    # one that is being sent right now is tombstoned like any stored at-bat.
+    # The cached rows and counters only change once the delete has stuck.
+    if get_hit_journal().discard(hit["id"]):
+        get_hit_cache().remove_hit(hit["id"])
+        get_aggregate_store().remove_hit(hit, in_backend=False)
         st.success("At bat deleted successfully!")
+        return
+    try:
+        get_storage().delete_hit(hit["id"])
     except Exception as e:
         st.error(f"Error deleting at-bat. Please try again.")
         print(f"Delete error: {str(e)}")
+        return
+    get_hit_cache().remove_hit(hit["id"])
+    get_aggregate_store().remove_hit(hit)
+    st.success("At bat deleted successfully!")
+
+
+def show_diagnostics_panel():
+    # Hidden unless the app is opened with ?diagnostics=1.
+    with st.expander("Diagnostics", expanded=True):
+        recorder = get_span_recorder()
+        st.caption("Span latency per stage (ms)")
+        st.dataframe(recorder.summary(), use_container_width=True)
+        storage = get_storage()
+        if hasattr(storage, "query_stats"):
+            st.caption("BigQuery (recent queries)")
+            st.json(storage.query_stats())
+            st.dataframe(list(storage.query_log)[-20:], use_container_width=True)
+        st.caption("Caches")
+        st.json({"hit_log": get_hit_cache().stats(), "dimensions": get_dimension_cache().stats(),
+                 "pending_at_bats": get_hit_journal().pending_count()})
+        rejected = get_hit_journal().dead_rows()
+        if rejected:
+            st.caption("At-bats rejected by the hit log (hit_journal.db, dead_hits)")
+            st.dataframe(rejected, use_container_width=True)
+        st.download_button("Export spans (JSON lines)", data=recorder.export_jsonl(),
+                           file_name="spans.jsonl", mime="application/x-ndjson", key="export_spans")
+        if st.button("Clear spans", key="clear_spans"):
+            recorder.clear()
 
 
 # =============================================================================
 # Load Options on Startup
 # =============================================================================
-if "opponent_options" not in st.session_state:
-    try:
-        st.session_state["opponent_options"] = load_opponent_options() or ["Team A", "Team B"]
-    except Exception as e:
-        st.session_state["opponent_options"] = ["Team A", "Team B"]
-
-if "hitter_options" not in st.session_state:
-    try:
-        st.session_state["hitter_options"] = load_hitter_options() or ["Hitter 1", "Hitter 2"]
-    except Exception as e:
-        st.session_state["hitter_options"] = ["Hitter 1", "Hitter 2"]
+rerun_started = time.perf_counter()
+# Periodically purges deleted at-bats from the hit log (one job per process).
+get_compaction_job()
+
+# Dimension lists come from the process-wide cache; any that are missing or
+# expired are fetched concurrently. Failures fall back to placeholders, which
+# are cached briefly so every rerun doesn't wait on a failing backend.
+dimension_cache = get_dimension_cache()
+opponent_options = dimension_cache.get("opponents")
+hitter_options = dimension_cache.get("hitters")
+option_fetches = {}
+if opponent_options is None:
+    option_fetches["opponents"] = Fetch(load_opponent_options)
+if hitter_options is None:
+    option_fetches["hitters"] = Fetch(load_hitter_options)
+if option_fetches:
+    option_results = fetch_concurrently(option_fetches)
+    if "opponents" in option_results:
+        opponent_options = option_results["opponents"]
+        if not opponent_options:
+            opponent_options = ["Team A", "Team B"]
+            dimension_cache.put("opponents", opponent_options, ttl=FALLBACK_TTL_SECONDS)
+    if "hitters" in option_results:
+        hitter_options = option_results["hitters"]
+        if not hitter_options:
+            hitter_options = ["Hitter 1", "Hitter 2"]
+            dimension_cache.put("hitters", hitter_options, ttl=FALLBACK_TTL_SECONDS)
 
 if "adding_opponent" not in st.session_state:
     st.session_state["adding_opponent"] = False
@@ -126,6 +189,14 @@ if "editing_hit" not in st.session_state:
     st.session_state["editing_hit"] = None
 if "deletion_success" not in st.session_state:
     st.session_state["deletion_success"] = False
+# Start-of-page cursors for the at-bat history; the last one is the current page.
+if "history_cursors" not in st.session_state:
+    st.session_state["history_cursors"] = [None]
+if "history_hitter" not in st.session_state:
+    st.session_state["history_hitter"] = None
+# The live game (a GameSession) while one is in progress.
+if "game" not in st.session_state:
+    st.session_state["game"] = None
 
 # =============================================================================
 # Global CSS
@@ -233,6 +304,23 @@ st.markdown(
 st.image("fuel_logo.jpeg", use_container_width=True)
 st.markdown("<h1 class='page-title'>Log At Bat</h1>", unsafe_allow_html=True)
 
+# Show how many at-bats are still waiting to be written to BigQuery, and why
+# the last attempt failed if it did.
+hit_journal = get_hit_journal()
+pending_at_bats = hit_journal.pending_count()
+if pending_at_bats:
+    st.caption(f"⏳ {pending_at_bats} at-bat(s) waiting to sync")
+    if hit_journal.last_error:
+        st.caption(f"⚠️ Last sync attempt failed: {hit_journal.last_error[:200]}")
+rejected_at_bats = hit_journal.dead_count()
+if rejected_at_bats:
+    st.warning(f"{rejected_at_bats} at-bat(s) were rejected by the hit log and set aside"
+               " (listed in the diagnostics panel, ?diagnostics=1).")
+game = st.session_state["game"]
+if game is not None:
+    st.caption(f"Live game vs {game.opponent} ({game.date}) · Inning {game.inning}, {game.outs} out(s)"
+               f" · At bat: {game.current_batter()} · {len(game.pending)} at-bat(s) not yet committed")
+
 # =============================================================================
 # Initialize other session state variables for flow.
 # =============================================================================
@@ -244,6 +332,64 @@ for key in ["stage", "hit_data", "img_click_data", "date", "opponent",
 # =============================================================================
 # Button Callbacks
 # =============================================================================
+def record_at_bat(hit_info, next_stage):
+    st.session_state["hit_data"].append(hit_info)
+    game = st.session_state["game"]
+    if game is None:
+        log_to_bigquery(hit_info)
+        st.session_state["stage"] = next_stage
+        return
+    # Live game: held in the session until the half-inning is committed,
+    # then straight on to the next batter.
+    if game.record(hit_info):
+        commit_game(end_half_inning=True)
+    st.session_state["hitter_name"] = game.current_batter()
+    st.session_state["stage"] = "select_outcome"
+
+def commit_game(end_half_inning=False):
+    game = st.session_state["game"]
+    try:
+        with span("game.commit"):
+            if end_half_inning:
+                committed = game.end_half_inning(commit_at_bats)
+            else:
+                committed = game.commit(commit_at_bats)
+    except Exception as e:
+        st.error(f"Error committing at-bats: {e}")
+        return False
+    if committed:
+        st.success(f"{committed} at-bat(s) committed!")
+    return True
+
+def show_game_setup():
+    st.session_state["stage"] = "game_setup"
+
+def start_game():
+    opponent = st.session_state.get("game_opponent")
+    lineup = st.session_state.get("game_lineup") or []
+    if not opponent or not lineup:
+        st.error("Please pick an opponent and at least one hitter for the batting order.")
+        return
+    game = GameSession(str(st.session_state["game_date"]), opponent, lineup)
+    st.session_state["game"] = game
+    st.session_state["date"] = game.date
+    st.session_state["opponent"] = game.opponent
+    st.session_state["hitter_name"] = game.current_batter()
+    st.session_state["stage"] = "select_outcome"
+
+def undo_game_at_bat():
+    game = st.session_state["game"]
+    hit_info = game.undo()
+    if hit_info is not None:
+        st.session_state["hit_data"] = [hit for hit in st.session_state["hit_data"] if hit["id"] != hit_info["id"]]
+    st.session_state["hitter_name"] = game.current_batter()
+
+def end_game():
+    # Any at-bats still pending are committed first; the game stays open if that fails.
+    if commit_game():
+        st.session_state["game"] = None
+        st.session_state["stage"] = "game_details"
+
 def submit_game_details():
     st.session_state["opponent"] = st.session_state.get("selected_opponent", "")
     st.session_state["hitter_name"] = st.session_state.get("selected_hitter", "")
@@ -268,9 +414,7 @@ def select_outcome(outcome):
             "x_coordinate": None,
             "y_coordinate": None
         }
-        st.session_state["hit_data"].append(hit_info)
-        log_to_bigquery(hit_info)
-        st.session_state["stage"] = "reset"
+        record_at_bat(hit_info, "reset")
 
 def select_batted_result(result):
     st.session_state["batted_result"] = result
@@ -285,10 +429,25 @@ def log_another_at_bat():
     st.session_state["stage"] = "game_details"
     st.session_state["img_click_data"] = None
 
-def delete_hit(hit_id):
-    delete_hit_from_bigquery(hit_id)
+def show_team_dashboard():
+    st.session_state["stage"] = "team_dashboard"
+
+def refresh_team_totals():
+    # Picks up other devices' at-bats; the rebuild runs in the background.
+    get_aggregate_store().request_rebuild()
+    st.success("Team totals are being refreshed.")
+
+def show_older_history(cursor):
+    st.session_state["history_cursors"].append(cursor)
+
+def show_newer_history():
+    if len(st.session_state["history_cursors"]) > 1:
+        st.session_state["history_cursors"].pop()
+
+def delete_hit(deleted):
+    delete_hit_from_bigquery(deleted)
     # Remove from local data if present
-    st.session_state["hit_data"] = [hit for hit in st.session_state["hit_data"] if hit["id"] != hit_id]
+    st.session_state["hit_data"] = [hit for hit in st.session_state["hit_data"] if hit["id"] != deleted["id"]]
     # Set a flag to indicate successful deletion
     st.session_state["deletion_success"] = True
     # Try to rerun safely
@@ -303,8 +462,8 @@ def edit_hit(hit):
     st.session_state["batted_result"] = hit["batted_result"]
     st.session_state["contact_type"] = hit["contact_type"]
     
-    # Delete the current hit
-    delete_hit_from_bigquery(hit["id"])
+    # Tombstone the current hit; the edited at-bat is logged as a new row.
+    delete_hit_from_bigquery(hit)
     
     # Set the flow to the appropriate stage based on the hit data
     if hit["outcome"] == "Batted Ball" and hit["batted_result"] is not None and hit["contact_type"] is not None:
@@ -316,7 +475,7 @@ def edit_hit(hit):
     else:
         st.session_state["stage"] = "select_outcome"
     
-    st.experimental_rerun()
+    rerun_app()
 
 # =============================================================================
 # UI Flow
@@ -327,39 +486,62 @@ if st.session_state["stage"] == "game_details":
         st.session_state["date"] = st.date_input("Select Date")
         # Opponent select box with plus button in a row
         col_opponent, col_opponent_plus = st.columns([4, 1])
-        col_opponent.selectbox("Opponent", st.session_state["opponent_options"], key="selected_opponent")
+        col_opponent.selectbox("Opponent", opponent_options, key="selected_opponent")
         if col_opponent_plus.button("➕", key="add_opponent"):
             st.session_state["adding_opponent"] = True
         if st.session_state["adding_opponent"]:
             new_opponent = st.text_input("New Opponent", key="new_opponent")
             if st.button("Save Opponent", key="save_opponent"):
-                if new_opponent and new_opponent not in st.session_state["opponent_options"]:
+                if new_opponent and new_opponent not in opponent_options:
                     save_opponent_to_bigquery(new_opponent)
-                    st.session_state["opponent_options"].append(new_opponent)
                 st.session_state["adding_opponent"] = False
                 rerun_app()
         # Hitter select box with plus button in a row
         col_hitter, col_hitter_plus = st.columns([4, 1])
-        col_hitter.selectbox("Hitter", st.session_state["hitter_options"], key="selected_hitter")
+        col_hitter.selectbox("Hitter", hitter_options, key="selected_hitter")
         if col_hitter_plus.button("➕", key="add_hitter"):
             st.session_state["adding_hitter"] = True
         if st.session_state["adding_hitter"]:
             new_hitter = st.text_input("New Hitter", key="new_hitter")
             if st.button("Save Hitter", key="save_hitter"):
-                if new_hitter and new_hitter not in st.session_state["hitter_options"]:
+                if new_hitter and new_hitter not in hitter_options:
                     save_hitter_to_bigquery(new_hitter)
-                    st.session_state["hitter_options"].append(new_hitter)
                 st.session_state["adding_hitter"] = False
                 rerun_app()
         st.button("Next", on_click=submit_game_details)
+        st.button("Team Leaderboard", on_click=show_team_dashboard, key="team_leaderboard")
+        st.button("Start Live Game", on_click=show_game_setup, key="start_live_game")
         st.markdown("</div>", unsafe_allow_html=True)
 
+elif st.session_state["stage"] == "game_setup":
+    st.header("Live Game")
+    st.date_input("Game Date", key="game_date")
+    st.selectbox("Opponent", opponent_options, key="game_opponent")
+    # Hitters are batted in the order they are picked.
+    st.multiselect("Batting Order", hitter_options, key="game_lineup")
+    st.button("Start Game", on_click=start_game, key="start_game")
+    st.button("Back", on_click=log_another_at_bat, key="game_setup_back")
+
 elif st.session_state["stage"] == "select_outcome":
+    game = st.session_state["game"]
+    if game is not None:
+        st.subheader(f"At bat: {game.current_batter()} (on deck: {game.on_deck()})")
     st.header("Select At-bat Outcome")
     st.button("SO Looking", on_click=select_outcome, args=("Strikeout Looking",), key="so_looking")
     st.button("SO Swinging", on_click=select_outcome, args=("Strikeout Swinging",), key="so_swinging")
     st.button("Walk", on_click=select_outcome, args=("Walk",), key="walk")
     st.button("Batted Ball", on_click=select_outcome, args=("Batted Ball",), key="batted_ball")
+    if game is not None:
+        # Commits happen on the third out; these cover everything else.
+        col_commit, col_undo = st.columns(2)
+        col_commit.button("Commit Now", on_click=commit_game, disabled=not game.pending, key="game_commit")
+        col_undo.button("Undo Last At-Bat", on_click=undo_game_at_bat, disabled=not game.pending,
+                        key="game_undo")
+        col_half, col_end = st.columns(2)
+        col_half.button("End Half-Inning", on_click=commit_game, args=(True,), key="game_end_half")
+        col_end.button("End Game", on_click=end_game, key="game_end")
+        with st.expander("Box Score", expanded=True):
+            st.dataframe(game.box_score(), use_container_width=True, hide_index=True)
 
 elif st.session_state["stage"] == "select_batted_result":
     st.header("Select Hit Result")
@@ -381,10 +563,14 @@ elif st.session_state["stage"] == "select_contact_type":
 
 elif st.session_state["stage"] == "log_hit_location":
     st.header("Double press on the field to log location")
-    img = Image.open("baseball_field_image.png")
-    click_data = streamlit_image_coordinates(img)
+    from streamlit_image_coordinates import streamlit_image_coordinates
+    from field_image import display_image, normalize_click
+    # Pre-encoded image sized for this device; clicks are stored as fractions of it.
+    display_width, display_path = display_image()
+    click_data = streamlit_image_coordinates(display_path, width=display_width, key="field_click")
     if click_data and click_data.get("x") is not None:
         st.session_state["img_click_data"] = click_data
+        x, y = normalize_click(click_data)
         hit_info = {
             "id": str(uuid.uuid4()),
             "date": str(st.session_state["date"]),
@@ -393,85 +579,83 @@ elif st.session_state["stage"] == "log_hit_location":
             "outcome": st.session_state["outcome"],
             "batted_result": st.session_state["batted_result"],
             "contact_type": st.session_state["contact_type"],
-            "x_coordinate": click_data["x"],
-            "y_coordinate": click_data["y"]
+            "x_coordinate": x,
+            "y_coordinate": y
         }
-        st.session_state["hit_data"].append(hit_info)
-        log_to_bigquery(hit_info)
-        st.session_state["stage"] = "plot_hit_location"
-        st.experimental_rerun()
+        record_at_bat(hit_info, "plot_hit_location")
+        rerun_app()
 
 elif st.session_state["stage"] == "plot_hit_location":
+    from field_zones import add_zone_columns
+    from hitter_aggregates import spray_bins_of
+    from hitting_metrics import (SPLITS, contact_percentages, counts_frame, game_log_table, hits_frame,
+                                 hitting_stats, split_table, standard_metrics_table)
+    from spray_chart import CONTACT_COLORS, render_density_chart, render_spray_chart
     # Load all hits for the current hitter from BigQuery.
     hits = load_hits_for_player(st.session_state["hitter_name"])
-    # Load all metrics from the view.
-    hard_hit, weak_hit, fly, line, ground = load_all_metrics_for_player(st.session_state["hitter_name"])
-    img = Image.open("baseball_field_image.png").convert("RGB")
-    fig, ax = plt.subplots()
-    ax.imshow(img)
-    ax.axis('off')
-    ax.set_xlim(0, img.width)
-    ax.set_ylim(img.height, 0)
-    # Add the title on the image: "<Hitter Name> Spray Chart"
-    ax.set_title(f"{st.session_state['hitter_name']} Spray Chart", fontsize=20, color='black', pad=20)
-    # Add metrics text below the title in two lines.
-    if None not in (hard_hit, weak_hit, fly, line, ground):
-        label_line = f"{'Hard Hit':^15}{'Weak Hit':^15}{'Fly Ball':^15}{'Line Drive':^15}{'Ground Ball':^15}"
-        value_line = f"{hard_hit:}%             {weak_hit:}%             {fly:}%             {line:}%              {ground:}%"
-        ax.text(0.5, 0.99, label_line, transform=ax.transAxes, ha='center', fontsize=7, color='black')
-        ax.text(0.5, 0.95, value_line, transform=ax.transAxes, ha='center', fontsize=7, color='black')
-    # Define color mapping for contact type.
-    contact_color = {
-        "Weak Ground Ball": "#CD853F",  # light brown
-        "Hard Ground Ball": "#8B4513",  # dark brown
-        "Weak Line Drive": "#90EE90",   # light green
-        "Hard Line Drive": "#006400",   # dark green
-        "Weak Fly Ball": "#ADD8E6",     # light blue
-        "Hard Fly Ball": "#00008B"      # dark blue
-    }
-    # Plot each hit dot with specified styling.
-    for hit in hits:
-        if hit["x_coordinate"] is not None and hit["y_coordinate"] is not None:
-            color = contact_color.get(hit.get("contact_type", ""), "red")
-            ax.scatter(hit["x_coordinate"], hit["y_coordinate"], color=color, s=50,
-                       edgecolors="black", linewidths=1)
-    # Create a legend using Line2D objects with dot markers.
-    legend_elements = [
-        Line2D([0], [0], marker='o', color='w', label=label,
-               markerfacecolor=color, markersize=8)
-        for label, color in contact_color.items()
-    ]
-    ax.legend(handles=legend_elements, loc="lower left", prop={'size': 8}, frameon=False)
-    st.pyplot(fig)
+    # Until the counters have been built (in the background), everything is
+    # computed from the loaded rows instead.
+    aggregates = get_aggregate_store()
+    aggregates_built = aggregates.is_built()
+    # Contact percentages come from the loaded rows (same definitions as vw_hitting_metrics).
+    with span("stats.contact_percentages"):
+        hard_hit, weak_hit, fly, line, ground = contact_percentages(hits)
+    chart_mode = st.radio("Chart", ["Dots", "Density"], horizontal=True, key="chart_mode")
+    if chart_mode == "Density":
+        # Drawn from pre-binned counts, so cost tracks the bin count, not the hit count.
+        density_label = st.selectbox("Contact Type", ["All Contacts"] + list(CONTACT_COLORS), key="density_contact")
+        density_contact = None if density_label == "All Contacts" else density_label
+        if aggregates_built:
+            bins = aggregates.spray_bins(st.session_state["hitter_name"], density_contact)
+        else:
+            bins = spray_bins_of(hits, density_contact)
+        chart_png = render_density_chart(st.session_state["hitter_name"], bins, SPRAY_BINS, density_contact)
+    else:
+        chart_png = render_spray_chart(st.session_state["hitter_name"], hits,
+                                       (hard_hit, weak_hit, fly, line, ground))
+    st.image(chart_png, use_container_width=True)
     st.button("Log Another At-Bat", on_click=log_another_at_bat)
     
     # =============================================================================
     # Calculate Standard Hitting Metrics and display as a table.
     # =============================================================================
-    import pandas as pd
-    # Definitions:
-    # Plate Appearances (PA): total number of hits logged.
-    # At Bats (AB): PA excluding walks.
-    # Hits: Only "Batted Ball" outcomes with batted_result in ["Single", "Double", "Triple", "Homerun"]
-    # Total Bases: Single = 1, Double = 2, Triple = 3, Homerun = 4.
-    num_plate = len(hits)
-    num_walks = sum(1 for hit in hits if hit["outcome"] == "Walk")
-    num_strikeouts = sum(1 for hit in hits if hit["outcome"] in ["Strikeout Looking", "Strikeout Swinging"])
-    num_hits = sum(1 for hit in hits if hit["outcome"] == "Batted Ball" and hit["batted_result"] in ["Single", "Double", "Triple", "Homerun"])
-    total_bases = sum({"Single": 1, "Double": 2, "Triple": 3, "Homerun": 4}.get(hit["batted_result"], 0)
-                      for hit in hits if hit["outcome"] == "Batted Ball")
-    at_bats = num_plate - num_walks  # Assuming all non-walks count as AB.
-    
-    batting_avg = num_hits / at_bats if at_bats > 0 else 0
-    slugging = total_bases / at_bats if at_bats > 0 else 0
-    onbase = (num_hits + num_walks) / num_plate if num_plate > 0 else 0
-    
-    metrics_df = pd.DataFrame({
-        "Metric": ["Batting Average", "Slugging Percentage", "On Base Percentage", "Walks", "Strikeouts"],
-        "Value": [f"{batting_avg:.3f}", f"{slugging:.3f}", f"{onbase:.3f}", num_walks, num_strikeouts]
-    })
+    # Season and per-game totals are read from the pre-aggregated counters;
+    # one columnar frame of the loaded rows feeds every split.
+    with span("stats.hits_frame"):
+        stats_frame = add_zone_columns(hits_frame(hits))
+    with span("stats.standard_metrics"):
+        if aggregates_built:
+            season_counts = counts_frame(aggregates.hitter_totals(st.session_state["hitter_name"]))
+            game_counts = counts_frame(aggregates.game_totals(st.session_state["hitter_name"]), ["date", "opponent"])
+        else:
+            season_counts = hitting_stats(stats_frame)
+            game_counts = hitting_stats(stats_frame, by=["day", "opponent"])
+        metrics_df = standard_metrics_table(season_counts)
     st.table(metrics_df)
-
+    with st.expander("Game Log"):
+        st.dataframe(game_log_table(game_counts), use_container_width=True)
+    with st.expander("Hitting Splits"):
+        split_label = st.selectbox("Split by", list(SPLITS), key="split_by")
+        with span("stats.split_table"):
+            split_df = split_table(stats_frame, SPLITS[split_label])
+        st.dataframe(split_df, use_container_width=True)
+
+
+elif st.session_state["stage"] == "team_dashboard":
+    st.header("Team Leaderboard")
+    aggregates = get_aggregate_store()
+    if aggregates.last_error:
+        st.warning(f"Team totals could not be rebuilt (retrying): {aggregates.last_error}")
+    elif not aggregates.is_built():
+        st.info("Team totals are still being built; check back in a moment.")
+    with span("stats.leaderboard"):
+        leaderboard = load_team_leaderboard()
+    if leaderboard.empty:
+        st.write("No at-bats logged yet.")
+    else:
+        st.dataframe(leaderboard, use_container_width=True)
+    st.button("Refresh Totals", on_click=refresh_team_totals, key="leaderboard_refresh")
+    st.button("Back", on_click=log_another_at_bat, key="leaderboard_back")
 
 elif st.session_state["stage"] == "reset":
     st.header("At-Bat Recorded")
@@ -490,9 +674,33 @@ elif st.session_state["stage"] == "reset":
         # Reset the flag
         st.session_state["deletion_success"] = False
     
-    # List of at bats for this player
-    st.header(f"At-Bat History for {st.session_state['hitter_name']}")
-    hits = load_hits_for_player(st.session_state["hitter_name"])
+    # List of at bats for this player, one page at a time (newest first).
+    hitter_name = st.session_state["hitter_name"]
+    st.header(f"At-Bat History for {hitter_name}")
+    if st.session_state["history_hitter"] != hitter_name:
+        st.session_state["history_hitter"] = hitter_name
+        st.session_state["history_cursors"] = [None]
+    page_index = len(st.session_state["history_cursors"]) - 1
+    # The page and the total count are fetched concurrently.
+    history = fetch_concurrently({
+        "hits": Fetch(load_history_page, (hitter_name, st.session_state["history_cursors"][-1]), None),
+        "total": Fetch(count_hits_for_player, (hitter_name,)),
+    })
+    hits = history["hits"]
+    if hits is None:
+        # The read failed; keep the page position so a rerun retries the same page.
+        st.error("Could not load the at-bat history. Please try again.")
+        hits = []
+    elif not hits and page_index > 0:
+        # The page emptied out (e.g. its last at-bat was deleted); step back.
+        st.session_state["history_cursors"] = [None]
+        page_index = 0
+        hits = load_history_page(hitter_name)
+    first_shown = page_index * HISTORY_PAGE_SIZE
+    # Without a count, only offer the pages already visited.
+    total_hits = history["total"] if history["total"] is not None else first_shown + len(hits)
+    if hits:
+        st.caption(f"Showing {first_shown + 1}-{first_shown + len(hits)} of {total_hits} at-bats")
     
     for hit in hits:
         hit_date = hit.get("date", "N/A")
@@ -506,9 +714,6 @@ elif st.session_state["stage"] == "reset":
         if hit.get("contact_type"):
             hit_details += f" ({hit.get('contact_type')})"
         
-        # Generate unique keys based on both the hit id and index position
-        hit_idx = hits.index(hit)
-        
         # Create visually appealing line item with background
         st.markdown(f"""
         <div class="at-bat-item">
@@ -522,6 +727,21 @@ elif st.session_state["stage"] == "reset":
         """, unsafe_allow_html=True)
         
         # Place delete button only
-        if st.button("❌", key=f"delete_{hit['id']}_{hit_idx}"):
-            delete_hit(hit["id"])
-            delete_hit(hit["id"])
+        if st.button("❌", key=f"delete_{hit['id']}"):
+            delete_hit(hit)
+    
+    col_newer, col_older = st.columns(2)
+    col_newer.button("◀ Newer", on_click=show_newer_history, disabled=page_index == 0,
+                     key="history_newer")
+    col_older.button("Older ▶", on_click=show_older_history,
+                     args=(history_key(hits[-1]) if hits else None,),
+                     disabled=first_shown + len(hits) >= total_hits, key="history_older")
+
+# =============================================================================
+# Diagnostics
+# =============================================================================
+# Reruns that end in rerun_app() stop before this point.
+get_span_recorder().record("rerun", time.perf_counter() - rerun_started,
+                           st.session_state["stage"], st.session_state["hitter_name"])
+if st.query_params.get("diagnostics") == "1":
+    show_diagnostics_panel()
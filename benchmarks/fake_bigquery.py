@@ -0,0 +1,168 @@
+"""A local stand-in for the BigQuery client, for benchmarks.
+
+FakeBigQueryClient answers the queries BigQueryStorage sends by rewriting
+them for an in-memory SQLite copy of the dataset, and sleeps for a
+configurable latency on every round trip. Plugging it in through
+FakeClientPool means the app runs its real BigQuery code path (query text,
+parameters, query_log) without credentials or network.
+
+bytes_processed is an estimate: BigQuery bills every row of each table a
+query reads, so it is the row count of the referenced tables times
+ROW_BYTES.
+"""
+import datetime
+import random
+import re
+import sqlite3
+import threading
+import time
+import types
+import uuid
+
+from storage import HIT_COLUMNS, BigQueryStorage
+
+# Rough on-disk size of one row per table, for the bytes_processed estimate.
+ROW_BYTES = {"fact_hit_log": 120, "dim_opponents": 16, "dim_hitters": 16, "hit_tombstones": 48}
+TABLE_NAME = re.compile(r"`[^`]*?\.?(\w+)`")
+
+OUTCOMES = [("Strikeout Looking", 0.08), ("Strikeout Swinging", 0.14), ("Walk", 0.09), ("Batted Ball", 0.69)]
+BATTED_RESULTS = [("Single", 0.3), ("Double", 0.08), ("Triple", 0.01), ("Homerun", 0.04), ("Out", 0.53),
+                  ("Error", 0.04)]
+CONTACT_TYPES = ["Weak Ground Ball", "Hard Ground Ball", "Weak Line Drive", "Hard Line Drive",
+                 "Weak Fly Ball", "Hard Fly Ball"]
+
+
+class FakeRow(dict):
+    # Supports both dict(row) and row.column, like google.cloud.bigquery.Row.
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class FakeQueryJob:
+    def __init__(self, rows, total_bytes_processed):
+        self._rows = rows
+        self.total_bytes_processed = total_bytes_processed
+        self.cache_hit = False
+
+    def result(self, page_size=None):
+        return iter(self._rows)
+
+
+class FakeBigQueryClient:
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.query_count = 0
+        self.insert_count = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("CREATE TABLE dim_opponents (opponent TEXT)")
+        self._conn.execute("CREATE TABLE dim_hitters (hitter TEXT)")
+        self._conn.execute(f"CREATE TABLE fact_hit_log ({', '.join(HIT_COLUMNS)})")
+        self._conn.execute("CREATE INDEX ix_fact_hit_log_hitter ON fact_hit_log (hitter_name, date)")
+        self._conn.execute("CREATE TABLE hit_tombstones (hit_id TEXT, deleted_at TEXT)")
+
+    def _table_bytes(self, query):
+        tables = set(TABLE_NAME.findall(query))
+        return sum(self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] * ROW_BYTES[table]
+                   for table in tables if table in ROW_BYTES)
+
+    def query(self, query, job_config=None):
+        params = {param.name: param.value.isoformat() if isinstance(param.value, datetime.date) else param.value
+                  for param in (job_config.query_parameters if job_config else [])}
+        time.sleep(self.latency)
+        with self._lock:
+            self.query_count += 1
+            total_bytes = self._table_bytes(query)
+            sql = TABLE_NAME.sub(r"\1", query).replace("@", ":")
+            if "DECLARE cutoff" in sql:
+                # compact_deleted_hits: a script with a declared cutoff.
+                cutoff = (datetime.datetime.now(datetime.timezone.utc)
+                          - datetime.timedelta(minutes=params.pop("min_age_minutes"))).isoformat()
+                sql = re.sub(r"DECLARE cutoff[^;]*;", "", sql).replace("cutoff", f"'{cutoff}'")
+            with self._conn:
+                rows = []
+                for statement in filter(str.strip, sql.split(";")):
+                    rows = [FakeRow(row) for row in self._conn.execute(statement, params).fetchall()]
+        return FakeQueryJob(rows, total_bytes)
+
+    def get_table(self, table):
+        # Dates are stored as ISO strings, like the baseline (unpartitioned) fact_hit_log.
+        table = table.rsplit(".", 1)[-1]
+        columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")]
+        return types.SimpleNamespace(schema=[
+            types.SimpleNamespace(name=column, field_type="FLOAT" if column.endswith("_coordinate") else "STRING")
+            for column in columns])
+
+    def insert_rows_json(self, table, rows, row_ids=None):
+        table = table.rsplit(".", 1)[-1]
+        time.sleep(self.latency)
+        with self._lock, self._conn:
+            self.insert_count += 1
+            for row in rows:
+                columns = list(row)
+                self._conn.execute(f"INSERT INTO {table} ({', '.join(columns)})"
+                                   f" VALUES ({', '.join('?' for _ in columns)})", [row[c] for c in columns])
+        return []
+
+    def seed(self, opponents, hitters, hits):
+        # Loads rows directly, without latency or counting.
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO dim_opponents VALUES (?)", [(name,) for name in opponents])
+            self._conn.executemany("INSERT INTO dim_hitters VALUES (?)", [(name,) for name in hitters])
+            self._conn.executemany(f"INSERT INTO fact_hit_log VALUES ({', '.join('?' for _ in HIT_COLUMNS)})",
+                                   [[hit.get(column) for column in HIT_COLUMNS] for hit in hits])
+
+
+class FakeClientPool:
+    # Same interface BigQueryStorage uses on bigquery_pool.BigQueryClientPool.
+    def __init__(self, client):
+        self.client = client
+
+    def get(self):
+        return self.client
+
+    def invalidate(self):
+        pass
+
+    def call(self, func):
+        return func()
+
+
+def fake_bigquery_storage(client, dataset="bench.hit_tracker_data"):
+    storage = BigQueryStorage(dataset)
+    storage._pool = FakeClientPool(client)
+    return storage
+
+
+def _pick(choices, rng):
+    return rng.choices([value for value, _ in choices], weights=[weight for _, weight in choices])[0]
+
+
+def synthetic_hits(hitter_name, count, opponents, seed=0, start_date=datetime.date(2023, 3, 1)):
+    """count at-bats for one hitter with a plausible outcome mix, spread over games."""
+    rng = random.Random(f"{seed}:{hitter_name}")
+    hits = []
+    for index in range(count):
+        outcome = _pick(OUTCOMES, rng)
+        hit = {
+            "id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "date": str(start_date + datetime.timedelta(days=index // 4)),
+            "opponent": rng.choice(opponents),
+            "hitter_name": hitter_name,
+            "outcome": outcome,
+            "batted_result": None,
+            "contact_type": None,
+            "x_coordinate": None,
+            "y_coordinate": None,
+        }
+        if outcome == "Batted Ball":
+            hit["batted_result"] = _pick(BATTED_RESULTS, rng)
+            hit["contact_type"] = rng.choice(CONTACT_TYPES)
+            hit["x_coordinate"] = round(rng.uniform(0.1, 0.9), 4)
+            hit["y_coordinate"] = round(rng.uniform(0.1, 0.8), 4)
+        hits.append(hit)
+    return hits
@@ -0,0 +1,178 @@
+"""End-to-end benchmarks for at_bat_tracker.py.
+
+Scripts the full stage machine with Streamlit's AppTest against the
+FakeBigQueryClient in fake_bigquery.py (game_details -> select_outcome ->
+select_batted_result -> select_contact_type -> log_hit_location ->
+plot_hit_location, then a strikeout through to the reset history page and
+the team leaderboard), and reports for each step the rerun latency, the
+number of BigQuery queries it sent and the process's peak memory so far.
+
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --at-bats 10 1000 --latency-ms 80 --output bench.jsonl
+
+Each history size runs in a fresh subprocess and temporary working
+directory (removed afterwards), so process-wide caches start cold and peak
+memory (max RSS) is per size. With
+--output, one JSON line per size is appended for tracking over time.
+"""
+import argparse
+import datetime
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(REPO_DIR, "at_bat_tracker.py")
+ASSETS = ["baseball_field_image.png", "fuel_logo.jpeg"]
+DEFAULT_AT_BATS = [10, 100, 1000, 10000]
+BENCH_HITTER = "Bench Hitter"
+OPPONENTS = ["Rivals", "Sharks", "Comets"]
+# A click in shallow center field, as reported for a 240 px wide display.
+FIELD_CLICK = {"x": 120, "y": 110, "width": 240, "height": 240, "unix_time": 0}
+
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def run_scenario(at_bats, latency, hitters, workdir):
+    sys.path.insert(0, REPO_DIR)
+    from streamlit.testing.v1 import AppTest
+
+    import storage
+    from fake_bigquery import FakeBigQueryClient, fake_bigquery_storage, synthetic_hits
+
+    for asset in ASSETS:
+        shutil.copy(os.path.join(REPO_DIR, asset), workdir)
+    os.chdir(workdir)
+
+    client = FakeBigQueryClient(latency)
+    roster = [BENCH_HITTER] + [f"Hitter {index}" for index in range(2, hitters + 1)]
+    client.seed(OPPONENTS, roster, [hit for hitter in roster for hit in synthetic_hits(hitter, at_bats, OPPONENTS)])
+    storage.create_storage = lambda config: fake_bigquery_storage(client)
+
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.secrets["storage"] = {"backend": "bigquery"}
+    steps = []
+
+    def step(name, action):
+        queries = client.query_count
+        started = time.perf_counter()
+        action()
+        seconds = time.perf_counter() - started
+        if at.exception:
+            raise RuntimeError(f"{name}: {[exception.message for exception in at.exception]}")
+        steps.append({"step": name, "stage": at.session_state["stage"], "ms": round(1000 * seconds, 1),
+                      "queries": client.query_count - queries, "peak_rss_mb": round(peak_rss_mb(), 1)})
+
+    def click(label=None, key=None):
+        buttons = [button for button in at.button
+                   if (key is not None and button.key == key) or (label is not None and button.label == label)]
+        return lambda: buttons[0].click().run()
+
+    def log_location():
+        at.session_state["field_click"] = FIELD_CLICK
+        at.run()
+
+    def choose_game():
+        at.selectbox(key="selected_opponent").select(OPPONENTS[0])
+        at.selectbox(key="selected_hitter").select(BENCH_HITTER)
+
+    step("game_details (cold)", at.run)
+    step("game_details (rerun)", at.run)
+    choose_game()
+    step("select_outcome", click(label="Next"))
+    step("select_batted_result", click(key="batted_ball"))
+    step("select_contact_type", click(key="single"))
+    step("log_hit_location", click(key="hard_line_drive"))
+    step("plot_hit_location (log + dots)", log_location)
+    step("plot_hit_location (rerun)", at.run)
+    step("plot_hit_location (density)", lambda: at.radio(key="chart_mode").set_value("Density").run())
+    step("game_details (log another)", click(label="Log Another At-Bat"))
+    choose_game()
+    step("select_outcome (2nd at-bat)", click(label="Next"))
+    step("reset (strikeout + history)", click(key="so_looking"))
+    older = [button for button in at.button if button.key == "history_older"]
+    if older and not older[0].disabled:
+        step("reset (older page)", click(key="history_older"))
+    step("game_details (back)", click(label="Log Another At-Bat"))
+    step("team_dashboard", click(key="team_leaderboard"))
+
+    return {
+        "at_bats": at_bats,
+        "hitters": hitters,
+        "latency_ms": round(1000 * latency, 1),
+        "steps": steps,
+        "total_ms": round(sum(entry["ms"] for entry in steps), 1),
+        "total_queries": client.query_count,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def print_report(results):
+    sizes = [result["at_bats"] for result in results]
+    width = max(len(entry["step"]) for result in results for entry in result["steps"])
+    print(f"{'step':<{width}}" + "".join(f"{f'{size} at-bats':>22}" for size in sizes))
+    # Step order of the longest run; optional steps (e.g. an older history page) only run at some sizes.
+    longest = max(results, key=lambda result: len(result["steps"]))
+    names = list(dict.fromkeys([entry["step"] for entry in longest["steps"]]
+                               + [entry["step"] for result in results for entry in result["steps"]]))
+    for name in names:
+        cells = []
+        for result in results:
+            entry = next((entry for entry in result["steps"] if entry["step"] == name), None)
+            cells.append(f"{entry['ms']:>10.1f} ms {entry['queries']:>3} q" if entry else "")
+        print(f"{name:<{width}}" + "".join(f"{cell:>22}" for cell in cells))
+    totals = [f"{result['total_ms']:>10.1f} ms {result['total_queries']:>3} q" for result in results]
+    print(f"{'total':<{width}}" + "".join(f"{cell:>22}" for cell in totals))
+    peaks = [f"{result['peak_rss_mb']:.1f} MB" for result in results]
+    print(f"{'peak RSS':<{width}}" + "".join(f"{cell:>22}" for cell in peaks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark at_bat_tracker.py reruns against a fake BigQuery.")
+    parser.add_argument("--at-bats", type=int, nargs="+", default=DEFAULT_AT_BATS,
+                        help="history sizes per hitter to benchmark")
+    parser.add_argument("--hitters", type=int, default=9, help="hitters on the roster, each with --at-bats rows")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="simulated BigQuery round-trip latency")
+    parser.add_argument("--output", help="append one JSON line per history size to this file")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        # Child process: one history size; the result is the last line of stdout.
+        result = run_scenario(args.at_bats[0], args.latency_ms / 1000, args.hitters, args.workdir)
+        print(json.dumps(result))
+        return
+
+    results = []
+    for at_bats in args.at_bats:
+        # Removed here rather than in the child, whose journal still writes to it on exit.
+        workdir = tempfile.mkdtemp(prefix="at_bat_bench_")
+        command = [sys.executable, os.path.abspath(__file__), "--single", "--at-bats", str(at_bats),
+                   "--hitters", str(args.hitters), "--latency-ms", str(args.latency_ms), "--workdir", workdir]
+        try:
+            child = subprocess.run(command, capture_output=True, text=True)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+        if child.returncode != 0:
+            sys.stderr.write(child.stderr)
+            sys.exit(f"Benchmark failed for {at_bats} at-bats")
+        result = json.loads(child.stdout.strip().splitlines()[-1])
+        result["recorded_at"] = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        results.append(result)
+        if args.output:
+            with open(args.output, "a") as output:
+                output.write(json.dumps(result) + "\n")
+    print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Process-wide pooled BigQuery client shared across reruns and sessions."""
+import datetime
+import threading
+
+import requests
+import streamlit as st
+from google.api_core import exceptions as api_exceptions
+from google.auth import exceptions as auth_exceptions
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.cloud import bigquery
+from google.oauth2 import service_account
+
+# Refresh the access token this long before it actually expires so a tap
+# never waits on a token fetch.
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+# Max pooled HTTP connections kept open to the BigQuery API.
+HTTP_POOL_SIZE = 10
+
+# Failures that mean the client itself has gone bad (expired/revoked token or
+# a dead connection) rather than a problem with the query.
+RECOVERABLE_ERRORS = (
+    auth_exceptions.RefreshError,
+    auth_exceptions.TransportError,
+    api_exceptions.Unauthorized,
+    requests.exceptions.ConnectionError,
+)
+
+
+class BigQueryClientPool:
+    def __init__(self, service_account_info):
+        self._service_account_info = dict(service_account_info)
+        self._lock = threading.Lock()
+        self._credentials = None
+        self._client = None
+        # Token fetches go through their own plain session: refreshing through
+        # the AuthorizedSession would make its before_request fetch a token
+        # first and then send the refresh POST with a bearer header attached.
+        self._auth_request = Request(requests.Session())
+
+    def _build(self):
+        credentials = service_account.Credentials.from_service_account_info(
+            self._service_account_info,
+            scopes=["https://www.googleapis.com/auth/cloud-platform"],
+        )
+        session = AuthorizedSession(credentials, auth_request=self._auth_request)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=HTTP_POOL_SIZE,
+                                                pool_maxsize=HTTP_POOL_SIZE)
+        session.mount("https://", adapter)
+        credentials.refresh(self._auth_request)
+        self._credentials = credentials
+        self._client = bigquery.Client(credentials=credentials,
+                                       project=credentials.project_id,
+                                       _http=session)
+
+    def _needs_refresh(self):
+        expiry = self._credentials.expiry
+        if not self._credentials.token or expiry is None:
+            return True
+        # google-auth stores expiry as a naive UTC datetime.
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return expiry - now <= TOKEN_REFRESH_MARGIN
+
+    def get(self):
+        with self._lock:
+            if self._client is None:
+                self._build()
+            elif self._needs_refresh():
+                try:
+                    self._credentials.refresh(self._auth_request)
+                except RECOVERABLE_ERRORS:
+                    self._close()
+                    self._build()
+            return self._client
+
+    def _close(self):
+        if self._client is not None:
+            try:
+                self._client.close()
+            except Exception:
+                pass
+        self._client = None
+        self._credentials = None
+
+    def invalidate(self):
+        with self._lock:
+            self._close()
+
+    def call(self, func, *args, **kwargs):
+        # Run func once; on an auth/transport failure rebuild the client and retry.
+        try:
+            return func(*args, **kwargs)
+        except RECOVERABLE_ERRORS:
+            self.invalidate()
+            return func(*args, **kwargs)
+
+
+@st.cache_resource(show_spinner=False)
+def get_client_pool():
+    return BigQueryClientPool(st.secrets["bigquery"])
@@ -0,0 +1,47 @@
+"""Background job that purges tombstoned at-bats from the hit log."""
+import threading
+import time
+
+import streamlit as st
+
+from storage import get_storage
+
+COMPACTION_INTERVAL = 3600.0
+
+
+class CompactionJob:
+    def __init__(self, storage, interval=COMPACTION_INTERVAL):
+        self.storage = storage
+        self.interval = interval
+        self.last_run = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        try:
+            self.storage.compact_deleted_hits()
+            self.last_error = None
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"Compaction error: {str(e)}")
+        self.last_run = time.time()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.run_once()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hit-log-compaction", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+@st.cache_resource(show_spinner=False)
+def get_compaction_job():
+    job = CompactionJob(get_storage())
+    job.start()
+    return job
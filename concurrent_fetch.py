@@ -0,0 +1,55 @@
+"""Run independent storage reads concurrently on a shared thread pool.
+
+Each call has its own timeout and a fallback value that is used if the call
+fails or is still running when its timeout expires, so a stage waits only as
+long as its slowest read. A call that times out before a worker picks it up
+is cancelled, so reads nobody waits for don't hold up the shared pool.
+"""
+import collections
+import concurrent.futures
+import threading
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+FETCH_TIMEOUT = 10.0
+MAX_WORKERS = 8
+
+Fetch = collections.namedtuple("Fetch", ["func", "args", "fallback", "timeout"],
+                               defaults=[(), None, FETCH_TIMEOUT])
+
+
+@st.cache_resource(show_spinner=False)
+def get_fetch_executor():
+    return concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS,
+                                                 thread_name_prefix="storage-fetch")
+
+
+def fetch_concurrently(calls):
+    # calls: {name: Fetch(...)} -> {name: result, or the call's fallback}
+    ctx = get_script_run_ctx()
+
+    def run(func, args):
+        # Lets the worker use st.cache_* helpers like the script thread does.
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args)
+
+    executor = get_fetch_executor()
+    started = time.monotonic()
+    futures = {name: executor.submit(run, call.func, call.args) for name, call in calls.items()}
+    results = {}
+    for name, future in futures.items():
+        call = calls[name]
+        remaining = max(0.0, call.timeout - (time.monotonic() - started))
+        try:
+            results[name] = future.result(timeout=remaining)
+        except concurrent.futures.TimeoutError:
+            # Still queued (e.g. behind other reruns' reads): drop it rather than run it for nobody.
+            future.cancel()
+            print(f"Fetch timed out: {name}")
+            results[name] = call.fallback
+        except Exception as e:
+            print(f"Fetch error ({name}): {str(e)}")
+            results[name] = call.fallback
+    return results
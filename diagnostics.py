@@ -0,0 +1,116 @@
+"""Timing spans for finding slow paths in a rerun.
+
+Storage calls, image decodes, chart renders and stats computations are wrapped
+in span(name); each span is tagged with the session's stage and hitter (when
+it runs on a script thread) and kept in a process-wide ring buffer. The
+diagnostics panel (open the app with ?diagnostics=1) shows p50/p95 per span
+and stage next to BigQuery bytes processed and cache hit rates, and exports
+the raw spans as JSON lines.
+"""
+import collections
+import contextlib
+import json
+import threading
+import time
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+MAX_SPANS = 5000
+
+
+class SpanRecorder:
+    def __init__(self, max_spans=MAX_SPANS):
+        self._spans = collections.deque(maxlen=max_spans)
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, stage=None, hitter=None, error=None):
+        with self._lock:
+            self._spans.append({
+                "name": name,
+                "stage": stage,
+                "hitter": hitter,
+                "seconds": seconds,
+                "error": error,
+                "at": time.time(),
+            })
+
+    def spans(self):
+        with self._lock:
+            return list(self._spans)
+
+    def summary(self):
+        # One row per (span name, stage): count, errors and p50/p95/max in ms.
+        groups = collections.defaultdict(list)
+        for span in self.spans():
+            groups[(span["name"], span["stage"])].append(span)
+        rows = []
+        for (name, stage), spans in sorted(groups.items(), key=lambda item: (item[0][0], str(item[0][1]))):
+            seconds = sorted(span["seconds"] for span in spans)
+            rows.append({
+                "span": name,
+                "stage": stage,
+                "count": len(seconds),
+                "errors": sum(span["error"] is not None for span in spans),
+                "p50_ms": round(1000 * percentile(seconds, 50), 1),
+                "p95_ms": round(1000 * percentile(seconds, 95), 1),
+                "max_ms": round(1000 * seconds[-1], 1),
+            })
+        return rows
+
+    def export_jsonl(self):
+        return "".join(json.dumps(span, default=str) + "\n" for span in self.spans())
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile of an already sorted, non-empty list.
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+@st.cache_resource(show_spinner=False)
+def get_span_recorder():
+    return SpanRecorder()
+
+
+def span_tags():
+    # (stage, hitter) of the session running on this thread, if any.
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None, None
+    return st.session_state.get("stage"), st.session_state.get("hitter_name")
+
+
+@contextlib.contextmanager
+def span(name):
+    stage, hitter = span_tags()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        get_span_recorder().record(name, time.perf_counter() - started, stage, hitter, error)
+
+
+class TimedStorage:
+    # Wraps a storage backend so every method call is recorded as a
+    # "storage.<method>" span; attributes pass through unchanged.
+    def __init__(self, storage):
+        self._storage = storage
+
+    def __getattr__(self, name):
+        attr = getattr(self._storage, name)
+        if not callable(attr):
+            return attr
+
+        def timed(*args, **kwargs):
+            with span(f"storage.{name}"):
+                return attr(*args, **kwargs)
+
+        return timed
@@ -0,0 +1,65 @@
+"""Process-wide cache of the dimension lists (opponents, hitters).
+
+Every session reads the same lists, so they are loaded once per process and
+kept for a TTL instead of being queried into each session's state. Saving a
+new opponent or hitter through the app adds it to the cached list directly.
+"""
+import threading
+import time
+
+import streamlit as st
+
+TTL_SECONDS = 600
+# Placeholders used after a failed load are retried sooner.
+FALLBACK_TTL_SECONDS = 60
+
+
+class DimensionCache:
+    def __init__(self, ttl=TTL_SECONDS):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}  # name -> (expires_at, [values])
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or time.monotonic() > entry[0]:
+                self._entries.pop(name, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return list(entry[1])
+
+    def put(self, name, values, ttl=None):
+        with self._lock:
+            self._entries[name] = (time.monotonic() + (self.ttl if ttl is None else ttl), list(values))
+
+    def add(self, name, value):
+        # Only a cached list is patched; a missing one loads fresh (with the value) on demand.
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and value not in entry[1]:
+                entry[1].append(value)
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_dimension_cache():
+    return DimensionCache()
@@ -0,0 +1,121 @@
+"""The field image and the coordinate frame hit locations are stored in.
+
+Hit locations are stored as fractions of the field image's width and height
+(0..1 from the top-left corner), so they mean the same thing at any display
+size. Rows logged before that were raw pixels on the 360x360 image;
+normalized_coordinates() converts them on read, and
+
+    python storage.py normalize-coordinates
+
+rewrites them in the hit log once. Run it before deploying this version
+against a baseline table: it also widens INT64 coordinate columns to
+FLOAT64, without which every fractional insert is rejected.
+
+For the click target the image is pre-encoded once per process into a few
+compressed display widths, and each session gets the one that fits its
+device instead of an uncompressed full-size PNG on every rerun.
+
+PIL and numpy are imported on first use, so logging an at-bat without a
+location (or storing one) does not load them.
+"""
+import os
+
+import streamlit as st
+
+from diagnostics import span
+
+FIELD_IMAGE_PATH = "baseball_field_image.png"
+# Pixel frame of rows logged before coordinates were normalized.
+LEGACY_IMAGE_SIZE = (360, 360)
+# Encoded click-target widths, smallest first; never upscaled past the source.
+DISPLAY_WIDTHS = (240, 300, 360)
+DISPLAY_CACHE_DIR = ".field_image_cache"
+MOBILE_USER_AGENT_MARKERS = ("Mobi", "iPhone", "Android")
+TABLET_USER_AGENT_MARKERS = ("iPad", "Tablet")
+
+
+@st.cache_resource(show_spinner=False)
+def load_field_image():
+    from PIL import Image
+    with span("image.decode"):
+        image = Image.open(FIELD_IMAGE_PATH).convert("RGB")
+        image.load()
+    return image
+
+
+@st.cache_resource(show_spinner=False)
+def load_field_array():
+    import numpy as np
+    array = np.asarray(load_field_image())
+    array.setflags(write=False)
+    return array
+
+
+@st.cache_resource(show_spinner=False)
+def encode_display_images():
+    # {width: path of an optimized PNG at that width}, written once per process.
+    from PIL import Image
+    with span("image.decode"):
+        source = Image.open(FIELD_IMAGE_PATH)
+        source.load()
+        if source.mode not in ("L", "P", "RGB"):
+            source = source.convert("RGB")
+    os.makedirs(DISPLAY_CACHE_DIR, exist_ok=True)
+    paths = {}
+    with span("image.encode"):
+        for width in DISPLAY_WIDTHS:
+            width = min(width, source.width)
+            height = round(source.height * width / source.width)
+            path = os.path.join(DISPLAY_CACHE_DIR, f"field_{width}.png")
+            image = source if width == source.width else source.resize((width, height), Image.LANCZOS)
+            image.save(path, format="PNG", optimize=True)
+            paths[width] = path
+    return paths
+
+
+def choose_display_width(widths):
+    # Smallest width for phones, the middle one for tablets, the largest otherwise.
+    widths = sorted(widths)
+    try:
+        user_agent = st.context.headers.get("User-Agent") or ""
+    except Exception:
+        user_agent = ""
+    if any(marker in user_agent for marker in TABLET_USER_AGENT_MARKERS):
+        return widths[len(widths) // 2]
+    if any(marker in user_agent for marker in MOBILE_USER_AGENT_MARKERS):
+        return widths[0]
+    return widths[-1]
+
+
+def display_image():
+    # (width, path) of the click-target image for the current session.
+    paths = encode_display_images()
+    width = choose_display_width(paths)
+    return width, paths[width]
+
+
+def normalize_click(click_data):
+    # Click position as fractions of the displayed image's size.
+    return (click_data["x"] / click_data["width"], click_data["y"] / click_data["height"])
+
+
+def normalized_coordinates(xs, ys):
+    """Vectorized (xs, ys) as fractions of the image; legacy pixel rows are scaled.
+
+    A row is legacy if either value is above 1. Missing values stay NaN.
+    """
+    import numpy as np
+    xs, ys = np.asarray(xs, dtype=float), np.asarray(ys, dtype=float)
+    legacy = (xs > 1) | (ys > 1)
+    return (np.where(legacy, xs / LEGACY_IMAGE_SIZE[0], xs),
+            np.where(legacy, ys / LEGACY_IMAGE_SIZE[1], ys))
+
+
+def hit_point(hit):
+    # Normalized (x, y) of one hit, or None if it has no location.
+    if hit.get("x_coordinate") is None or hit.get("y_coordinate") is None:
+        return None
+    x, y = float(hit["x_coordinate"]), float(hit["y_coordinate"])
+    if x > 1 or y > 1:
+        return x / LEGACY_IMAGE_SIZE[0], y / LEGACY_IMAGE_SIZE[1]
+    return x, y
@@ -0,0 +1,125 @@
+"""Field-zone features for hit locations via precomputed per-pixel lookup maps.
+
+The infield arc and the fence are traced once from baseball_field_image.png
+along rays out of home plate. From them every pixel of the image gets a zone
+index, a spray angle and a distance from home plate, so features for any
+number of hits are plain array lookups.
+
+Spray angles are in degrees from the line through second base: negative
+toward left field (third-base side), positive toward right field. Without
+batter handedness in the hit log, directions are left/center/right rather
+than pull/opposite.
+"""
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from diagnostics import span
+from field_image import load_field_array, normalized_coordinates
+
+# Home plate center as a fraction of image width/height (measured on the field image).
+HOME_PLATE = (0.4986, 0.7944)
+FOUL_LINE_ANGLE = 45.0
+# Search windows, as fractions of image height, for tracing the two arcs.
+INFIELD_ARC_SEARCH = (0.27, 0.45)
+FENCE_SEARCH = (0.47, 0.72)
+# Arcs are traced inside this angle; beyond it the rays run along the foul lines.
+TRACE_MAX_ANGLE = 42.0
+# Rays (0.5 degrees apart) in the rolling median applied to each traced arc.
+ARC_SMOOTHING = 15
+CENTER_FIELD_HALF_ANGLE = 15.0
+
+ZONES = ["Foul", "Infield Left", "Infield Center", "Infield Right",
+         "Outfield Left", "Outfield Center", "Outfield Right", "Over Fence"]
+DEPTHS = ["Infield", "Shallow Outfield", "Deep Outfield", "Over Fence", "Foul"]
+SPRAY_ANGLE_BINS = np.arange(-FOUL_LINE_ANGLE, FOUL_LINE_ANGLE + 1, 15.0)
+# Labels of the bins from left field to right field; the split keeps this order.
+SPRAY_ANGLE_LABELS = [str(interval) for interval in pd.IntervalIndex.from_breaks(SPRAY_ANGLE_BINS)]
+
+
+def _trace_arc(dark, home, angles, search):
+    # Distance from home to the first dark pixel along each ray inside search.
+    height, width = dark.shape
+    radii = np.arange(int(search[0] * height), int(search[1] * height))
+    theta = np.radians(angles)[:, None]
+    xs = np.clip(np.rint(home[0] + radii * np.sin(theta)).astype(int), 0, width - 1)
+    ys = np.clip(np.rint(home[1] - radii * np.cos(theta)).astype(int), 0, height - 1)
+    hits = dark[ys, xs]
+    traced = np.where(hits.any(axis=1), radii[hits.argmax(axis=1)], np.nan)
+    # A rolling median drops rays that stopped early on a base or a line marking.
+    padded = np.pad(traced, ARC_SMOOTHING // 2, mode="edge")
+    return np.nanmedian(np.lib.stride_tricks.sliding_window_view(padded, ARC_SMOOTHING), axis=1)
+
+
+def compute_zone_maps(field):
+    """Return (zone, spray_angle, distance, depth) arrays shaped like the field image.
+
+    zone and depth are indexes into ZONES and DEPTHS; foul territory is
+    "Foul" in both, so a foul fly doesn't count toward an outfield depth.
+    """
+    height, width = field.shape[:2]
+    dark = field.mean(axis=2) < 128 if field.ndim == 3 else field < 128
+    home = (HOME_PLATE[0] * width, HOME_PLATE[1] * height)
+
+    angles = np.arange(-TRACE_MAX_ANGLE, TRACE_MAX_ANGLE + 0.25, 0.5)
+    infield = _trace_arc(dark, home, angles, INFIELD_ARC_SEARCH)
+    fence = _trace_arc(dark, home, angles, FENCE_SEARCH)
+    found_infield, found_fence = ~np.isnan(infield), ~np.isnan(fence)
+
+    ys, xs = np.mgrid[0:height, 0:width]
+    dx, dy = xs - home[0], home[1] - ys
+    distance = np.hypot(dx, dy).astype(np.float32)
+    spray_angle = np.degrees(np.arctan2(dx, dy)).astype(np.float32)
+    # Arc distances for each pixel's angle; held constant past the traced range.
+    infield_at = np.interp(spray_angle, angles[found_infield], infield[found_infield])
+    fence_at = np.interp(spray_angle, angles[found_fence], fence[found_fence])
+
+    direction = np.digitize(spray_angle, [-CENTER_FIELD_HALF_ANGLE, CENTER_FIELD_HALF_ANGLE])
+    zone = np.where(distance <= infield_at, 1 + direction, 4 + direction)
+    zone = np.where(distance > fence_at, 7, zone)
+    zone = np.where((np.abs(spray_angle) > FOUL_LINE_ANGLE) | (dy < 0), 0, zone).astype(np.uint8)
+    depth = np.select([zone == 0, distance <= infield_at, distance <= (infield_at + fence_at) / 2,
+                       distance <= fence_at], [4, 0, 1, 2], 3).astype(np.uint8)
+    return zone, spray_angle, distance, depth
+
+
+@st.cache_resource(show_spinner=False)
+def load_zone_maps():
+    field = load_field_array()
+    with span("image.zone_maps"):
+        maps = compute_zone_maps(field)
+    for array in maps:
+        array.setflags(write=False)
+    return maps
+
+
+def zone_features(xs, ys):
+    """Vectorized lookup of zone, depth, spray angle and distance for hit locations.
+
+    xs/ys are stored hit coordinates and may contain NaN for hits without a
+    location; those rows get None/NaN. Distances are in field-image pixels.
+    """
+    zone, spray_angle, distance, depth = load_zone_maps()
+    height, width = zone.shape
+    xs, ys = normalized_coordinates(xs, ys)
+    located = ~(np.isnan(xs) | np.isnan(ys))
+    cols = np.clip(np.nan_to_num(xs * width).astype(int), 0, width - 1)
+    rows = np.clip(np.nan_to_num(ys * height).astype(int), 0, height - 1)
+    zone_names, depth_names = np.array(ZONES, dtype=object), np.array(DEPTHS, dtype=object)
+    return pd.DataFrame({
+        "field_zone": np.where(located, zone_names[zone[rows, cols]], None),
+        "depth": np.where(located, depth_names[depth[rows, cols]], None),
+        "spray_angle": np.where(located, spray_angle[rows, cols], np.nan),
+        "distance": np.where(located, distance[rows, cols], np.nan),
+    })
+
+
+def add_zone_columns(frame):
+    # Adds zone features to a hitting_metrics.hits_frame() in one lookup pass.
+    features = zone_features(frame["x_coordinate"].to_numpy(dtype=float),
+                             frame["y_coordinate"].to_numpy(dtype=float))
+    features.index = frame.index
+    frame = pd.concat([frame, features], axis=1)
+    # An ordered categorical, so the split sorts by angle rather than as text.
+    frame["spray_angle_bin"] = pd.cut(frame["spray_angle"], SPRAY_ANGLE_BINS, labels=SPRAY_ANGLE_LABELS)
+    return frame
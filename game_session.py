@@ -0,0 +1,93 @@
+"""Live game mode: one game, one batting order, batched commits.
+
+A GameSession fixes the date and opponent once and walks the batting order,
+so each at-bat only needs its outcome. At-bats are held in the session until
+the half-inning ends (the third out) or the scorer commits them, then reach
+the hit journal as one batch. The box score is computed from the game's
+at-bats in memory and never reads storage.
+
+Kept free of numpy/pandas, like hit_outcomes.
+"""
+import collections
+
+from hit_outcomes import BASES_PER_HIT, STRIKEOUT_OUTCOMES
+
+OUTS_PER_HALF_INNING = 3
+BOX_SCORE_COLUMNS = ["PA", "AB", "H", "TB", "BB", "K"]
+
+
+def is_out(hit):
+    return hit["outcome"] in STRIKEOUT_OUTCOMES or hit.get("batted_result") == "Out"
+
+
+class GameSession:
+    def __init__(self, date, opponent, lineup):
+        self.date = date
+        self.opponent = opponent
+        self.lineup = list(lineup)
+        self.batter_index = 0
+        self.inning = 1
+        self.outs = 0
+        self.pending = []
+        self.committed = []
+
+    def current_batter(self):
+        return self.lineup[self.batter_index % len(self.lineup)]
+
+    def on_deck(self):
+        return self.lineup[(self.batter_index + 1) % len(self.lineup)]
+
+    def record(self, hit_info):
+        # Holds one at-bat and moves to the next batter; True once the half-inning has three outs.
+        self.pending.append(hit_info)
+        self.batter_index += 1
+        self.outs += is_out(hit_info)
+        return self.outs >= OUTS_PER_HALF_INNING
+
+    def undo(self):
+        # Takes back the last at-bat that has not been committed yet.
+        if not self.pending:
+            return None
+        hit = self.pending.pop()
+        self.batter_index -= 1
+        self.outs -= is_out(hit)
+        return hit
+
+    def commit(self, commit_fn):
+        # Hands the pending at-bats to commit_fn as one batch; they stay pending if it raises.
+        batch = list(self.pending)
+        if batch:
+            commit_fn(batch)
+            self.committed.extend(batch)
+            self.pending = []
+        return len(batch)
+
+    def end_half_inning(self, commit_fn):
+        count = self.commit(commit_fn)
+        self.inning += 1
+        self.outs = 0
+        return count
+
+    def at_bats(self):
+        return self.committed + self.pending
+
+    def box_score(self):
+        # One row per lineup slot plus a team line, in batting order.
+        lines = collections.OrderedDict((hitter, collections.Counter()) for hitter in self.lineup)
+        for hit in self.at_bats():
+            line = lines.setdefault(hit["hitter_name"], collections.Counter())
+            bases = BASES_PER_HIT.get(hit.get("batted_result"), 0) if hit["outcome"] == "Batted Ball" else 0
+            line["PA"] += 1
+            line["AB"] += hit["outcome"] != "Walk"  # Same AB definition as hitting_metrics.
+            line["H"] += bases > 0
+            line["TB"] += bases
+            line["BB"] += hit["outcome"] == "Walk"
+            line["K"] += hit["outcome"] in STRIKEOUT_OUTCOMES
+        lines["Team"] = sum(lines.values(), collections.Counter())
+        rows = []
+        for hitter, line in lines.items():
+            row = {"Hitter": hitter}
+            row.update((column, int(line[column])) for column in BOX_SCORE_COLUMNS)
+            row["AVG"] = f"{line['H'] / line['AB']:.3f}" if line["AB"] else "—"
+            rows.append(row)
+        return rows
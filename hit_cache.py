@@ -0,0 +1,80 @@
+"""Process-wide, per-hitter cache of hit-log rows.
+
+Entries expire after a TTL and the least recently used hitter is evicted once
+the cache is full. Writes and deletes made through the app patch cached
+entries in place, so a hitter's history never has to be re-read just because
+this session changed it.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import streamlit as st
+
+MAX_HITTERS = 64
+TTL_SECONDS = 300
+
+
+class HitLogCache:
+    def __init__(self, max_hitters=MAX_HITTERS, ttl=TTL_SECONDS):
+        self.max_hitters = max_hitters
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # hitter_name -> (loaded_at, {id: row})
+        self._lock = threading.Lock()
+
+    def get(self, hitter_name):
+        with self._lock:
+            entry = self._entries.get(hitter_name)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(hitter_name, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(hitter_name)
+            self.hits += 1
+            return [dict(row) for row in entry[1].values()]
+
+    def put(self, hitter_name, rows):
+        with self._lock:
+            self._entries[hitter_name] = (time.monotonic(), {row["id"]: dict(row) for row in rows})
+            self._entries.move_to_end(hitter_name)
+            while len(self._entries) > self.max_hitters:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def add_hit(self, hit_info):
+        # Only hitters already cached are patched; others load fresh on demand.
+        with self._lock:
+            entry = self._entries.get(hit_info["hitter_name"])
+            if entry is not None:
+                entry[1][hit_info["id"]] = dict(hit_info)
+
+    def remove_hit(self, hit_id):
+        with self._lock:
+            for _, rows in self._entries.values():
+                rows.pop(hit_id, None)
+
+    def invalidate(self, hitter_name=None):
+        with self._lock:
+            if hitter_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(hitter_name, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hitters_cached": len(self._entries),
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_hit_cache():
+    return HitLogCache()
@@ -0,0 +1,206 @@
+"""Write-behind queue for at-bat inserts backed by a local SQLite journal.
+
+Every at-bat is appended to the journal (and therefore survives a dropped
+connection or an app restart) and a background thread flushes batches to
+fact_hit_log through the configured storage backend. The hit id is sent as
+the BigQuery insertId, so a batch that is retried after a partial failure
+does not create duplicate rows.
+
+A row the backend rejects on its own (e.g. a schema mismatch) is retried
+MAX_ATTEMPTS times and then moved to the dead_hits table, so it can't block
+the rows behind it; the app shows how many are set aside.
+"""
+import atexit
+import contextlib
+import json
+import sqlite3
+import threading
+
+import streamlit as st
+
+from storage import get_storage
+
+JOURNAL_PATH = "hit_journal.db"
+# Flush as soon as this many rows are waiting...
+BATCH_SIZE = 50
+# ...or at least this often (seconds) while anything is waiting.
+FLUSH_INTERVAL = 5.0
+# Upper bound for the retry back-off after failed flushes (seconds).
+MAX_BACKOFF = 120.0
+# Per-row rejections before a row is moved to dead_hits.
+MAX_ATTEMPTS = 5
+
+
+class HitJournal:
+    def __init__(self, path, flush_fn, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.last_error = None
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS pending_hits ("
+                " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " id TEXT UNIQUE NOT NULL,"
+                " payload TEXT NOT NULL,"
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " in_flight INTEGER NOT NULL DEFAULT 0)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS dead_hits ("
+                " id TEXT PRIMARY KEY, payload TEXT NOT NULL, attempts INTEGER NOT NULL,"
+                " error TEXT, failed_at TEXT DEFAULT CURRENT_TIMESTAMP)"
+            )
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(pending_hits)")]
+            if "in_flight" not in columns:
+                conn.execute("ALTER TABLE pending_hits ADD COLUMN in_flight INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def append(self, hit_info):
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO pending_hits (id, payload) VALUES (?, ?)",
+                         (hit_info["id"], json.dumps(hit_info)))
+        if self.pending_count() >= self.batch_size:
+            self._wake.set()
+
+    def append_many(self, rows):
+        # A batch (e.g. a live-game half-inning) in one transaction, flushed right away.
+        with self._connect() as conn:
+            conn.executemany("INSERT OR REPLACE INTO pending_hits (id, payload) VALUES (?, ?)",
+                             [(row["id"], json.dumps(row)) for row in rows])
+        self._wake.set()
+
+    def discard(self, hit_id):
+        # Drops a row that is waiting and not being sent; returns True if it
+        # was. A row already in flight may reach storage, so the caller has to
+        # delete it there instead.
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM pending_hits WHERE id = ? AND in_flight = 0", (hit_id,))
+            return cursor.rowcount > 0
+
+    def pending_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM pending_hits").fetchone()[0]
+
+    def dead_count(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM dead_hits").fetchone()[0]
+
+    def dead_rows(self):
+        # Rows set aside after MAX_ATTEMPTS rejections, with the last error.
+        with self._connect() as conn:
+            rows = conn.execute("SELECT payload, attempts, error, failed_at FROM dead_hits ORDER BY failed_at")
+            return [dict(json.loads(payload), attempts=attempts, error=error, failed_at=failed_at)
+                    for payload, attempts, error, failed_at in rows.fetchall()]
+
+    def pending_rows(self, hitter_name=None):
+        with self._connect() as conn:
+            payloads = conn.execute("SELECT payload FROM pending_hits ORDER BY seq").fetchall()
+        rows = [json.loads(payload) for (payload,) in payloads]
+        if hitter_name is not None:
+            rows = [row for row in rows if row.get("hitter_name") == hitter_name]
+        return rows
+
+    def flush(self):
+        # Sends pending rows in batches; returns the number of rows flushed.
+        flushed = 0
+        with self._flush_lock:
+            while True:
+                with self._connect() as conn:
+                    # Marked before they are read, so discard() can't drop a row being sent.
+                    conn.execute("UPDATE pending_hits SET in_flight = 1 WHERE seq IN"
+                                 " (SELECT seq FROM pending_hits ORDER BY seq LIMIT ?)", (self.batch_size,))
+                    batch = conn.execute("SELECT id, payload FROM pending_hits WHERE in_flight = 1"
+                                         " ORDER BY seq LIMIT ?", (self.batch_size,)).fetchall()
+                if not batch:
+                    break
+                ids = [hit_id for hit_id, _ in batch]
+                rows = [json.loads(payload) for _, payload in batch]
+                try:
+                    errors = self.flush_fn(rows) or []
+                except Exception as e:
+                    # The whole request failed (e.g. no connection); nothing is held against the rows.
+                    self._release(ids)
+                    self.last_error = str(e)
+                    raise
+                failed = {ids[error["index"]]: error.get("errors") for error in errors}
+                done = [hit_id for hit_id in ids if hit_id not in failed]
+                with self._connect() as conn:
+                    conn.executemany("DELETE FROM pending_hits WHERE id = ?", [(i,) for i in done])
+                flushed += len(done)
+                if failed:
+                    self._mark_failed(failed)
+                    break
+                self.last_error = None
+        return flushed
+
+    @contextlib.contextmanager
+    def flush_paused(self):
+        # Holds back flushes, so pending rows don't reach storage while a reader
+        # (e.g. an aggregate rebuild) looks at both.
+        with self._flush_lock:
+            yield
+
+    def _release(self, ids):
+        with self._connect() as conn:
+            conn.executemany("UPDATE pending_hits SET in_flight = 0 WHERE id = ?", [(i,) for i in ids])
+
+    def _mark_failed(self, failed):
+        # failed: {id: the backend's errors for that row}. Rows BigQuery only
+        # skipped because another row in the request was invalid (reason
+        # "stopped") are retried without counting an attempt.
+        rejected = {hit_id: row_errors for hit_id, row_errors in failed.items()
+                    if any(error.get("reason") != "stopped" for error in row_errors or [{}])}
+        self.last_error = str(next(iter((rejected or failed).values())))
+        self._release(failed)
+        with self._connect() as conn:
+            conn.executemany("UPDATE pending_hits SET attempts = attempts + 1 WHERE id = ?",
+                             [(i,) for i in rejected])
+            conn.executemany(
+                "INSERT OR REPLACE INTO dead_hits (id, payload, attempts, error)"
+                " SELECT id, payload, attempts, ? FROM pending_hits WHERE id = ? AND attempts >= ?",
+                [(str(row_errors), hit_id, MAX_ATTEMPTS) for hit_id, row_errors in rejected.items()])
+            conn.execute("DELETE FROM pending_hits WHERE id IN (SELECT id FROM dead_hits)")
+
+    def _run(self):
+        backoff = self.flush_interval
+        while not self._stop.is_set():
+            self._wake.wait(backoff)
+            self._wake.clear()
+            try:
+                self.flush()
+                backoff = self.flush_interval
+            except Exception as e:
+                print(f"Hit journal flush error: {str(e)}")
+                backoff = min(backoff * 2, MAX_BACKOFF)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="hit-journal-writer", daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Hit journal flush error: {str(e)}")
+
+
+@st.cache_resource(show_spinner=False)
+def get_hit_journal():
+    journal = HitJournal(JOURNAL_PATH, get_storage().insert_hits)
+    journal.start()
+    return journal
@@ -0,0 +1,195 @@
+"""Bulk import and Parquet export of the hit log.
+
+    python hit_log_io.py import scorebook_2024.csv playoffs_2024.parquet [--dry-run]
+    python hit_log_io.py export hits_2024.parquet [--hitter NAME] [--opponent NAME]
+                                                  [--start-date 2024-03-01] [--end-date 2024-10-31]
+
+Import reads CSV or Parquet files in chunks and checks every row against the
+schema the app logs (see validate_hit). The valid rows go into one staging
+Parquet file, and the storage backend loads that with a single load job; rows
+whose id is already in the hit log, deleted, or brought in by an earlier
+import are skipped, so re-running an import is safe and doesn't bring back
+deleted at-bats. If any row is invalid nothing is loaded, and the first
+MAX_REPORTED_ERRORS problems are printed with their file and row number.
+
+Export streams live rows (optionally filtered) into a Parquet file one Arrow
+record batch at a time, so neither direction holds a whole season in memory.
+
+Imported rows reach the app's hitter aggregates at its next periodic rebuild
+(within hitter_aggregates.REFRESH_INTERVAL), or straight away with
+`python hitter_aggregates.py rebuild`.
+"""
+import argparse
+import csv
+import datetime
+import os
+import tempfile
+import uuid
+
+from field_image import hit_point
+from hit_outcomes import BATTED_RESULTS, CONTACT_TYPES, OUTCOMES
+from storage import BULK_BATCH_ROWS, HIT_COLUMNS, create_storage, hit_arrow_schema, load_storage_config
+
+REQUIRED_COLUMNS = ["date", "opponent", "hitter_name", "outcome"]
+MAX_REPORTED_ERRORS = 20
+
+
+def _text(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _date(value):
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value).strip())
+
+
+def validate_hit(row):
+    """Return (hit, problems) for one input row.
+
+    hit has exactly HIT_COLUMNS; a missing id gets a new uuid4, and
+    coordinates in pixels of the 360x360 field image are normalized like the
+    app does on read.
+    """
+    problems = []
+    hit = {column: _text(row.get(column)) for column in ["id", "opponent", "hitter_name", "outcome",
+                                                          "batted_result", "contact_type"]}
+    hit["id"] = hit["id"] or str(uuid.uuid4())
+    for column in ["opponent", "hitter_name"]:
+        if hit[column] is None:
+            problems.append(f"{column} is required")
+    try:
+        hit["date"] = _date(row.get("date")) if row.get("date") not in (None, "") else None
+    except ValueError:
+        hit["date"] = None
+        problems.append(f"date {row.get('date')!r} is not YYYY-MM-DD")
+    else:
+        if hit["date"] is None:
+            problems.append("date is required")
+    if hit["outcome"] not in OUTCOMES:
+        problems.append(f"outcome {hit['outcome']!r} is not one of {OUTCOMES}")
+
+    x, y = _text(row.get("x_coordinate")), _text(row.get("y_coordinate"))
+    hit["x_coordinate"] = hit["y_coordinate"] = None
+    if (x is None) != (y is None):
+        problems.append("x_coordinate and y_coordinate must be given together")
+    elif x is not None:
+        try:
+            hit["x_coordinate"], hit["y_coordinate"] = hit_point({"x_coordinate": float(x), "y_coordinate": float(y)})
+        except ValueError:
+            problems.append(f"location ({x!r}, {y!r}) is not numeric")
+        else:
+            if not (0 <= hit["x_coordinate"] <= 1 and 0 <= hit["y_coordinate"] <= 1):
+                problems.append(f"location ({x}, {y}) is outside the field image")
+
+    if hit["outcome"] == "Batted Ball":
+        if hit["batted_result"] not in BATTED_RESULTS:
+            problems.append(f"batted_result {hit['batted_result']!r} is not one of {BATTED_RESULTS}")
+        if hit["contact_type"] is not None and hit["contact_type"] not in CONTACT_TYPES:
+            problems.append(f"contact_type {hit['contact_type']!r} is not one of {CONTACT_TYPES}")
+    elif hit["outcome"] in OUTCOMES:
+        # Walks and strikeouts are logged without a batted result, contact type or location.
+        if hit["batted_result"] is not None or hit["contact_type"] is not None or x is not None:
+            problems.append(f"batted ball details given for a {hit['outcome']}")
+    return {column: hit[column] for column in HIT_COLUMNS}, problems
+
+
+def read_batches(path, batch_size=BULK_BATCH_ROWS):
+    # Record batches of a CSV (all columns read as text) or Parquet file.
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    if path.lower().endswith(".parquet"):
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+        return
+    with open(path, newline="") as source:
+        header = next(csv.reader(source), [])
+    reader = pacsv.open_csv(path, convert_options=pacsv.ConvertOptions(
+        column_types={name: pa.string() for name in header}, strings_can_be_null=True))
+    yield from reader
+
+
+def import_files(storage, paths, dry_run=False):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    schema = hit_arrow_schema()
+    errors, seen_ids, valid = [], set(), 0
+    staging = tempfile.NamedTemporaryFile(suffix=".parquet", delete=False)
+    staging.close()
+    try:
+        with pq.ParquetWriter(staging.name, schema) as writer:
+            for path in paths:
+                row_number = 0
+                for batch in read_batches(path):
+                    unknown = sorted(set(batch.schema.names) - set(HIT_COLUMNS))
+                    missing = [column for column in REQUIRED_COLUMNS if column not in batch.schema.names]
+                    if unknown or missing:
+                        errors.append(f"{path}: unexpected columns {unknown}, missing columns {missing}")
+                        break
+                    hits = []
+                    for row in batch.to_pylist():
+                        row_number += 1
+                        hit, problems = validate_hit(row)
+                        if hit["id"] in seen_ids:
+                            problems.append(f"duplicate id {hit['id']}")
+                        seen_ids.add(hit["id"])
+                        if problems:
+                            errors.append(f"{path} row {row_number}: {'; '.join(problems)}")
+                        else:
+                            hits.append(hit)
+                    if hits and not errors:
+                        writer.write_batch(pa.RecordBatch.from_pylist(hits, schema=schema))
+                    valid += len(hits)
+        if errors:
+            for error in errors[:MAX_REPORTED_ERRORS]:
+                print(error)
+            raise SystemExit(f"{len(errors)} problem(s) found; nothing was imported")
+        if dry_run:
+            print(f"{valid} rows are valid (dry run, nothing imported)")
+            return 0
+        added = storage.import_hits_parquet(staging.name)
+        print(f"Imported {added} of {valid} rows ({valid - added} already in the hit log)")
+        return added
+    finally:
+        os.unlink(staging.name)
+
+
+def export_file(storage, path, hitter_name=None, start_date=None, end_date=None, opponent=None):
+    import pyarrow.parquet as pq
+    rows = 0
+    with pq.ParquetWriter(path, hit_arrow_schema()) as writer:
+        for batch in storage.export_hit_batches(hitter_name, start_date, end_date, opponent):
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    print(f"Exported {rows} rows to {path}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import and Parquet export of the hit log.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="validate CSV/Parquet files and load them in one job")
+    importer.add_argument("paths", nargs="+")
+    importer.add_argument("--dry-run", action="store_true", help="only validate")
+    exporter = commands.add_parser("export", help="stream the hit log (or a slice) to Parquet")
+    exporter.add_argument("path")
+    exporter.add_argument("--hitter")
+    exporter.add_argument("--opponent")
+    exporter.add_argument("--start-date", type=datetime.date.fromisoformat)
+    exporter.add_argument("--end-date", type=datetime.date.fromisoformat)
+    args = parser.parse_args()
+
+    storage = create_storage(load_storage_config())
+    if args.command == "import":
+        import_files(storage, args.paths, args.dry_run)
+    else:
+        export_file(storage, args.path, args.hitter, args.start_date, args.end_date, args.opponent)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+"""Outcome definitions shared by the stats engine, the aggregate counters and
+the bulk importer.
+
+Kept free of numpy/pandas so logging an at-bat does not import them.
+"""
+# Values the logging flow can produce, in button order.
+OUTCOMES = ["Strikeout Looking", "Strikeout Swinging", "Walk", "Batted Ball"]
+BATTED_RESULTS = ["Error", "Single", "Double", "Triple", "Homerun", "Out"]
+CONTACT_TYPES = ["Weak Ground Ball", "Hard Ground Ball", "Weak Line Drive", "Hard Line Drive",
+                 "Weak Fly Ball", "Hard Fly Ball"]
+# Hits: Only "Batted Ball" outcomes with batted_result in ["Single", "Double", "Triple", "Homerun"]
+# Total Bases: Single = 1, Double = 2, Triple = 3, Homerun = 4.
+BASES_PER_HIT = {"Single": 1, "Double": 2, "Triple": 3, "Homerun": 4}
+STRIKEOUT_OUTCOMES = ["Strikeout Looking", "Strikeout Swinging"]
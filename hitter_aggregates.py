@@ -0,0 +1,369 @@
+"""Pre-aggregated hitting counters maintained incrementally on write.
+
+Counts of PA, walks, strikeouts, each batted_result and each contact_type
+are kept per hitter and per hitter/opponent/date in a local SQLite file, so
+reading a hitter's (or the whole roster's) stats is a keyed lookup rather
+than a scan of their history. Hit locations are likewise binned into a
+SPRAY_BINS x SPRAY_BINS grid over the field per hitter and contact type for
+the density spray chart. log_to_bigquery and delete_hit_from_bigquery
+apply each change as it happens; applying the same hit id twice is a no-op.
+
+A rebuild replaces the counters with GROUP BY totals computed by the storage
+backend (no hit rows are downloaded) plus the journal's unflushed at-bats.
+It runs on a background thread when the store is empty, whenever the last
+build is older than REFRESH_INTERVAL (so other devices' writes and bulk
+imports are picked up within the hit cache's TTL, like the rows the plot
+stage loads), again after a failure (with back-off), and whenever
+request_rebuild() is called from the team leaderboard. To rebuild by hand
+(e.g. after restoring the hit log):
+
+    python hitter_aggregates.py rebuild
+"""
+import argparse
+import collections
+import contextlib
+import sqlite3
+import threading
+import time
+
+import streamlit as st
+
+from field_image import hit_point
+from hit_cache import TTL_SECONDS
+from hit_journal import JOURNAL_PATH, HitJournal, get_hit_journal
+from hit_outcomes import BASES_PER_HIT, STRIKEOUT_OUTCOMES
+from storage import create_storage, get_storage, load_storage_config
+
+AGGREGATES_PATH = "hitter_aggregates.db"
+# Longest a build is used before it is redone (seconds); loaded hit rows are
+# cached for as long, so the counters and the rows never disagree for longer.
+REFRESH_INTERVAL = float(TTL_SECONDS)
+# Back-off between failed rebuilds (seconds), doubling up to the maximum.
+REBUILD_RETRY_INTERVAL = 30.0
+MAX_REBUILD_RETRY_INTERVAL = 900.0
+# Bumped whenever the tables below change; older files are rebuilt from scratch.
+SCHEMA_VERSION = "4"
+# Density-chart bins along each side of the field image.
+SPRAY_BINS = 30
+
+RESULT_COUNTERS = {
+    "Single": "result_single",
+    "Double": "result_double",
+    "Triple": "result_triple",
+    "Homerun": "result_homerun",
+    "Out": "result_out",
+    "Error": "result_error",
+}
+CONTACT_COUNTERS = {
+    "Weak Ground Ball": "contact_weak_ground_ball",
+    "Hard Ground Ball": "contact_hard_ground_ball",
+    "Weak Line Drive": "contact_weak_line_drive",
+    "Hard Line Drive": "contact_hard_line_drive",
+    "Weak Fly Ball": "contact_weak_fly_ball",
+    "Hard Fly Ball": "contact_hard_fly_ball",
+}
+COUNTER_COLUMNS = ["pa", "walks", "strikeouts"] + list(RESULT_COUNTERS.values()) + list(CONTACT_COUNTERS.values())
+HIT_FIELDS = ["id", "hitter_name", "opponent", "date", "outcome", "batted_result", "contact_type",
+              "x_coordinate", "y_coordinate"]
+# SQL condition behind each counter, for the storage backend's GROUP BY; must
+# agree with hit_counters().
+COUNTER_CONDITIONS = {
+    "pa": "TRUE",
+    "walks": "outcome = 'Walk'",
+    "strikeouts": f"outcome IN ({', '.join(repr(outcome) for outcome in STRIKEOUT_OUTCOMES)})",
+}
+COUNTER_CONDITIONS.update((column, f"outcome = 'Batted Ball' AND batted_result = '{result}'")
+                          for result, column in RESULT_COUNTERS.items())
+COUNTER_CONDITIONS.update((column, f"contact_type = '{contact}'") for contact, column in CONTACT_COUNTERS.items())
+AGGREGATE_TABLES = ["counted_hits", "removed_hits", "hitter_counts", "hitter_game_counts", "hitter_spray_bins"]
+
+
+def _sum_of(counters):
+    return " + ".join(counters) or "0"
+
+
+# Counter columns -> the count columns hitting_metrics works with.
+STATS_SELECT = ", ".join([
+    "pa", "walks", "strikeouts",
+    f"{_sum_of(RESULT_COUNTERS[result] for result in BASES_PER_HIT)} AS hits",
+    f"{' + '.join(f'{bases} * {RESULT_COUNTERS[result]}' for result, bases in BASES_PER_HIT.items())} AS total_bases",
+    f"{_sum_of(CONTACT_COUNTERS.values())} AS contact",
+    f"{_sum_of(c for t, c in CONTACT_COUNTERS.items() if t.startswith('Hard '))} AS hard_hit",
+    f"{_sum_of(c for t, c in CONTACT_COUNTERS.items() if t.startswith('Weak '))} AS weak_hit",
+    f"{_sum_of(c for t, c in CONTACT_COUNTERS.items() if t.endswith(' Fly Ball'))} AS fly",
+    f"{_sum_of(c for t, c in CONTACT_COUNTERS.items() if t.endswith(' Line Drive'))} AS line",
+    f"{_sum_of(c for t, c in CONTACT_COUNTERS.items() if t.endswith(' Ground Ball'))} AS ground",
+])
+
+
+def hit_counters(hit):
+    # The counter increments one at-bat contributes.
+    counters = dict.fromkeys(COUNTER_COLUMNS, 0)
+    counters["pa"] = 1
+    counters["walks"] = int(hit.get("outcome") == "Walk")
+    counters["strikeouts"] = int(hit.get("outcome") in STRIKEOUT_OUTCOMES)
+    if hit.get("outcome") == "Batted Ball" and hit.get("batted_result") in RESULT_COUNTERS:
+        counters[RESULT_COUNTERS[hit["batted_result"]]] = 1
+    if hit.get("contact_type") in CONTACT_COUNTERS:
+        counters[CONTACT_COUNTERS[hit["contact_type"]]] = 1
+    return counters
+
+
+def spray_bin(hit):
+    # (bin_x, bin_y) of a hit's location, or None if it has none.
+    point = hit_point(hit)
+    if point is None:
+        return None
+    return tuple(min(int(value * SPRAY_BINS), SPRAY_BINS - 1) for value in point)
+
+
+def spray_bins_of(hits, contact_type=None):
+    # AggregateStore.spray_bins() computed from loaded rows, for before the store is built.
+    cells = collections.Counter(spray_bin(hit) for hit in hits
+                                if contact_type is None or hit.get("contact_type") == contact_type)
+    cells.pop(None, None)
+    return [location + (count,) for location, count in cells.items()]
+
+
+class AggregateStore:
+    def __init__(self, path=AGGREGATES_PATH):
+        self.path = path
+        self.last_rebuild = None
+        self.last_error = None
+        self._rebuild_requested = threading.Event()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        counter_ddl = ", ".join(f"{column} INTEGER NOT NULL DEFAULT 0" for column in COUNTER_COLUMNS)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            version = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+            if version is None or version[0] != SCHEMA_VERSION:
+                for table in AGGREGATE_TABLES:
+                    self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+                self._conn.execute("DELETE FROM meta")
+                self._conn.execute("INSERT INTO meta (key, value) VALUES ('schema_version', ?)",
+                                   (SCHEMA_VERSION,))
+            # Rows added since the last rebuild, so repeats are ignored and deletes know what to subtract.
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS counted_hits ({', '.join(HIT_FIELDS)},"
+                               " PRIMARY KEY (id))")
+            # Rows subtracted since the last rebuild, so repeated deletes are ignored.
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS removed_hits ({', '.join(HIT_FIELDS)},"
+                               " removed_at REAL, in_backend INTEGER, PRIMARY KEY (id))")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS hitter_counts"
+                               f" (hitter_name TEXT PRIMARY KEY, {counter_ddl})")
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS hitter_game_counts"
+                               f" (hitter_name TEXT, opponent TEXT, date TEXT, {counter_ddl},"
+                               " PRIMARY KEY (hitter_name, opponent, date))")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS hitter_spray_bins"
+                               " (hitter_name TEXT, contact_type TEXT, bin_x INTEGER, bin_y INTEGER,"
+                               " hits INTEGER NOT NULL DEFAULT 0,"
+                               " PRIMARY KEY (hitter_name, contact_type, bin_x, bin_y))")
+
+    def _apply(self, hit, sign):
+        counters = hit_counters(hit)
+        columns = ", ".join(COUNTER_COLUMNS)
+        values = [sign * counters[column] for column in COUNTER_COLUMNS]
+        placeholders = ", ".join("?" for _ in COUNTER_COLUMNS)
+        updates = ", ".join(f"{column} = {column} + excluded.{column}" for column in COUNTER_COLUMNS)
+        self._conn.execute(
+            f"INSERT INTO hitter_counts (hitter_name, {columns}) VALUES (?, {placeholders})"
+            f" ON CONFLICT (hitter_name) DO UPDATE SET {updates}",
+            [hit.get("hitter_name")] + values,
+        )
+        self._conn.execute(
+            f"INSERT INTO hitter_game_counts (hitter_name, opponent, date, {columns})"
+            f" VALUES (?, ?, ?, {placeholders})"
+            f" ON CONFLICT (hitter_name, opponent, date) DO UPDATE SET {updates}",
+            [hit.get("hitter_name"), hit.get("opponent") or "", str(hit.get("date"))] + values,
+        )
+        location = spray_bin(hit)
+        if location is not None:
+            self._conn.execute(
+                "INSERT INTO hitter_spray_bins (hitter_name, contact_type, bin_x, bin_y, hits)"
+                " VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (hitter_name, contact_type, bin_x, bin_y) DO UPDATE SET hits = hits + excluded.hits",
+                (hit.get("hitter_name"), hit.get("contact_type") or "") + location + (sign,),
+            )
+
+    def _counted(self, hit_id):
+        row = self._conn.execute("SELECT * FROM counted_hits WHERE id = ?", (hit_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def _add(self, hit):
+        # Caller holds the lock and an open transaction.
+        hit = {field: hit.get(field) for field in HIT_FIELDS}
+        hit["date"] = str(hit["date"])
+        previous = self._counted(hit["id"])
+        if previous == hit:
+            return
+        if previous is not None:
+            self._apply(previous, -1)
+        self._apply(hit, 1)
+        self._conn.execute(f"INSERT OR REPLACE INTO counted_hits ({', '.join(HIT_FIELDS)})"
+                           f" VALUES ({', '.join('?' for _ in HIT_FIELDS)})",
+                           [hit[field] for field in HIT_FIELDS])
+
+    def add_hits(self, rows):
+        with self._lock, self._conn:
+            for hit in rows:
+                self._add(hit)
+
+    def remove_hit(self, hit, in_backend=True):
+        # hit is the deleted row: at-bats counted by a rebuild are not in
+        # counted_hits, so it says what to subtract. in_backend is False for
+        # an at-bat dropped from the journal before it was flushed.
+        with self._lock, self._conn:
+            if self._conn.execute("SELECT 1 FROM removed_hits WHERE id = ?", (hit["id"],)).fetchone():
+                return
+            removed = self._counted(hit["id"])
+            if removed is None:
+                removed = {field: hit.get(field) for field in HIT_FIELDS}
+                removed["date"] = str(removed["date"])
+            self._apply(removed, -1)
+            self._conn.execute("DELETE FROM counted_hits WHERE id = ?", (hit["id"],))
+            self._conn.execute(f"INSERT INTO removed_hits ({', '.join(HIT_FIELDS)}, removed_at, in_backend)"
+                               f" VALUES ({', '.join('?' for _ in HIT_FIELDS)}, ?, ?)",
+                               [removed[field] for field in HIT_FIELDS] + [time.time(), int(in_backend)])
+
+    def _rebuild(self, games, bins, pending, started):
+        """Replace every counter with the backend's totals (caller holds the lock).
+
+        games and bins are rows of storage.load_game_counts() and
+        load_spray_bin_counts(); pending are the journal's unflushed at-bats.
+        At-bats the backend had that were removed while it was being read may
+        still be in its totals, so they are subtracted again.
+        """
+        columns = ", ".join(COUNTER_COLUMNS)
+        placeholders = ", ".join("?" for _ in COUNTER_COLUMNS)
+        removed = [dict(row) for row in self._conn.execute(
+            f"SELECT {', '.join(HIT_FIELDS)} FROM removed_hits WHERE removed_at >= ? AND in_backend = 1",
+            (started,))]
+        with self._conn:
+            for table in AGGREGATE_TABLES:
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany(
+                f"INSERT INTO hitter_game_counts (hitter_name, opponent, date, {columns})"
+                f" VALUES (?, ?, ?, {placeholders})",
+                [[game["hitter_name"], game["opponent"] or "", str(game["date"])]
+                 + [game[column] or 0 for column in COUNTER_COLUMNS] for game in games])
+            self._conn.execute(
+                f"INSERT INTO hitter_counts (hitter_name, {columns})"
+                f" SELECT hitter_name, {', '.join(f'SUM({column})' for column in COUNTER_COLUMNS)}"
+                " FROM hitter_game_counts GROUP BY hitter_name")
+            self._conn.executemany(
+                "INSERT INTO hitter_spray_bins (hitter_name, contact_type, bin_x, bin_y, hits)"
+                " VALUES (?, ?, ?, ?, ?)",
+                [(cell["hitter_name"], cell["contact_type"], cell["bin_x"], cell["bin_y"], cell["hits"])
+                 for cell in bins])
+            for hit in pending:
+                self._add(hit)
+            for hit in removed:
+                self._apply(hit, -1)
+                self._conn.execute(f"INSERT INTO removed_hits ({', '.join(HIT_FIELDS)}, removed_at, in_backend)"
+                                   f" VALUES ({', '.join('?' for _ in HIT_FIELDS)}, ?, 1)",
+                                   [hit[field] for field in HIT_FIELDS] + [started])
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built_at', ?)",
+                               (str(time.time()),))
+        self.last_rebuild = time.time()
+
+    def rebuild_from(self, storage, journal=None):
+        # Flushes are held back meanwhile, so no at-bat is in both the
+        # backend's totals and the journal, or in neither.
+        started = time.time()
+        with journal.flush_paused() if journal is not None else contextlib.nullcontext():
+            games = storage.load_game_counts(COUNTER_CONDITIONS)
+            bins = storage.load_spray_bin_counts(SPRAY_BINS)
+            with self._lock:
+                pending = journal.pending_rows() if journal is not None else []
+                self._rebuild(games, bins, pending, started)
+
+    def request_rebuild(self):
+        self._rebuild_requested.set()
+
+    def built_at(self):
+        # time.time() of the last rebuild (also from an earlier run), or None.
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'built_at'").fetchone()
+        return float(row[0]) if row is not None else None
+
+    def is_built(self):
+        return self.built_at() is not None
+
+    def hitter_totals(self, hitter_name):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT hitter_name, {STATS_SELECT} FROM hitter_counts"
+                                      " WHERE hitter_name = ?", (hitter_name,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def all_totals(self):
+        with self._lock:
+            rows = self._conn.execute(f"SELECT hitter_name, {STATS_SELECT} FROM hitter_counts"
+                                      " WHERE pa > 0").fetchall()
+        return [dict(row) for row in rows]
+
+    def game_totals(self, hitter_name):
+        # One row per opponent/date the hitter appeared in.
+        with self._lock:
+            rows = self._conn.execute(f"SELECT opponent, date, {STATS_SELECT} FROM hitter_game_counts"
+                                      " WHERE hitter_name = ? AND pa > 0 ORDER BY date",
+                                      (hitter_name,)).fetchall()
+        return [dict(row) for row in rows]
+
+    def spray_bins(self, hitter_name, contact_type=None):
+        # [(bin_x, bin_y, hits)] for one contact type, or all of them.
+        query = "SELECT bin_x, bin_y, SUM(hits) FROM hitter_spray_bins WHERE hitter_name = ? AND hits > 0"
+        params = [hitter_name]
+        if contact_type is not None:
+            query += " AND contact_type = ?"
+            params.append(contact_type)
+        with self._lock:
+            rows = self._conn.execute(query + " GROUP BY bin_x, bin_y", params).fetchall()
+        return [tuple(row) for row in rows]
+
+
+def _rebuild_loop(store, storage, journal):
+    # Rebuilds when the store is empty or stale, every REFRESH_INTERVAL, after
+    # a failure and on request.
+    built_at = store.built_at()
+    if built_at is not None:
+        store._rebuild_requested.wait(max(0.0, built_at + REFRESH_INTERVAL - time.time()))
+    retry = REBUILD_RETRY_INTERVAL
+    while True:
+        store._rebuild_requested.clear()
+        try:
+            store.rebuild_from(storage, journal)
+        except Exception as e:
+            store.last_error = str(e)
+            print(f"Aggregate rebuild error: {str(e)}")
+            store._rebuild_requested.wait(retry)
+            retry = min(retry * 2, MAX_REBUILD_RETRY_INTERVAL)
+        else:
+            store.last_error = None
+            retry = REBUILD_RETRY_INTERVAL
+            store._rebuild_requested.wait(REFRESH_INTERVAL)
+
+
+@st.cache_resource(show_spinner=False)
+def get_aggregate_store():
+    # Never rebuilds on the script thread; readers check is_built() meanwhile.
+    store = AggregateStore()
+    threading.Thread(target=_rebuild_loop, args=(store, get_storage(), get_hit_journal()),
+                     name="hitter-aggregates-rebuild", daemon=True).start()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the pre-aggregated hitter counters.")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.add_argument("--path", default=AGGREGATES_PATH)
+    args = parser.parse_args()
+    store = AggregateStore(args.path)
+    store.rebuild_from(create_storage(load_storage_config()), HitJournal(JOURNAL_PATH, None))
+    print(f"Rebuilt {args.path}: {len(store.all_totals())} hitters")
+
+
+if __name__ == "__main__":
+    main()
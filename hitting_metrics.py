@@ -0,0 +1,209 @@
+"""Hitting metrics computed locally from loaded hit-log rows.
+
+contact_percentages() mirrors the definitions in vw_hitting_metrics so the
+spray chart can be labelled from the rows it already has instead of querying
+the view again. The stats engine below turns the rows into one columnar frame
+and computes slash lines, K% and BB% for any grouping from it.
+"""
+import numpy as np
+import pandas as pd
+
+from hit_outcomes import BASES_PER_HIT, STRIKEOUT_OUTCOMES
+
+# Each contact type is "<Hard|Weak> <Ground Ball|Line Drive|Fly Ball>".
+CONTACT_STRENGTHS = ["Hard", "Weak"]
+CONTACT_TRAJECTORIES = ["Fly Ball", "Line Drive", "Ground Ball"]
+
+
+def round_half_up(values, digits=1):
+    # BigQuery's ROUND rounds halves away from zero; numpy rounds to even.
+    scale = 10 ** digits
+    return np.floor(np.asarray(values, dtype=float) * scale + 0.5) / scale
+
+
+def contact_percentages(hits):
+    """Return (hard_hit, weak_hit, fly, line, ground) as percentages.
+
+    Matches vw_hitting_metrics: shares are taken over the hitter's rows that
+    have a contact type and rounded to one decimal. Returns Nones when there
+    are no batted balls, like the view returning no row.
+    """
+    contact = np.array([hit.get("contact_type") for hit in hits
+                        if hit.get("contact_type") is not None], dtype=str)
+    if contact.size == 0:
+        return None, None, None, None, None
+    parts = np.char.partition(contact, " ")
+    strength, trajectory = parts[:, 0], parts[:, 2]
+    counts = [(strength == label).sum() for label in CONTACT_STRENGTHS]
+    counts += [(trajectory == label).sum() for label in CONTACT_TRAJECTORIES]
+    percentages = round_half_up(100.0 * np.array(counts) / contact.size)
+    return tuple(float(value) for value in percentages)
+
+
+# =============================================================================
+# Columnar hitting-stats engine
+# =============================================================================
+# Definitions:
+# Plate Appearances (PA): total number of hits logged.
+# At Bats (AB): PA excluding walks.
+# Hits and Total Bases: see hit_outcomes.BASES_PER_HIT.
+COUNT_COLUMNS = ["pa", "walks", "strikeouts", "hits", "total_bases"]
+# Contact-type counts behind contact_percentages(), in its order.
+CONTACT_COUNT_COLUMNS = ["contact", "hard_hit", "weak_hit", "fly", "line", "ground"]
+# Groupings offered by hitting_stats(); "month" and "week" are date windows.
+SPLITS = {
+    "Opponent": "opponent",
+    "Month": "month",
+    "Week": "week",
+    "Contact Type": "contact_type",
+    "Outcome": "outcome",
+    "Batted Result": "batted_result",
+    # Added by field_zones.add_zone_columns().
+    "Field Zone": "field_zone",
+    "Depth": "depth",
+    "Spray Angle": "spray_angle_bin",
+}
+
+
+def hits_frame(hits):
+    """Build the per-PA columnar frame every split is computed from."""
+    frame = pd.DataFrame.from_records(
+        hits, columns=["id", "date", "hitter_name", "opponent", "outcome", "batted_result", "contact_type",
+                       "x_coordinate", "y_coordinate"])
+    batted = (frame["outcome"] == "Batted Ball").to_numpy()
+    bases = frame["batted_result"].map(BASES_PER_HIT).fillna(0).to_numpy(dtype=int) * batted
+    frame["pa"] = 1
+    frame["walks"] = (frame["outcome"] == "Walk").astype(int)
+    frame["strikeouts"] = frame["outcome"].isin(STRIKEOUT_OUTCOMES).astype(int)
+    frame["hits"] = (bases > 0).astype(int)
+    frame["total_bases"] = bases
+    contact = frame["contact_type"].fillna("")
+    frame["contact"] = (contact != "").astype(int)
+    frame["hard_hit"] = contact.str.startswith("Hard ").astype(int)
+    frame["weak_hit"] = contact.str.startswith("Weak ").astype(int)
+    frame["fly"] = contact.str.endswith(" Fly Ball").astype(int)
+    frame["line"] = contact.str.endswith(" Line Drive").astype(int)
+    frame["ground"] = contact.str.endswith(" Ground Ball").astype(int)
+    dates = pd.to_datetime(frame["date"].astype(str), errors="coerce")
+    frame["date"] = dates
+    frame["day"] = dates.dt.strftime("%Y-%m-%d")
+    frame["month"] = dates.dt.strftime("%Y-%m")
+    frame["week"] = dates.dt.to_period("W").dt.start_time.dt.strftime("%Y-%m-%d")
+    return frame
+
+
+def add_rates(counts):
+    # AVG/SLG/OBP/OPS and K%/BB% from summed counts (0 when undefined).
+    counts = counts.copy()
+    at_bats = counts["pa"] - counts["walks"]  # Assuming all non-walks count as AB.
+    safe_ab = at_bats.where(at_bats > 0)
+    safe_pa = counts["pa"].where(counts["pa"] > 0)
+    counts["at_bats"] = at_bats
+    counts["avg"] = (counts["hits"] / safe_ab).fillna(0.0)
+    counts["slg"] = (counts["total_bases"] / safe_ab).fillna(0.0)
+    counts["obp"] = ((counts["hits"] + counts["walks"]) / safe_pa).fillna(0.0)
+    counts["ops"] = counts["obp"] + counts["slg"]
+    counts["k_pct"] = (100.0 * counts["strikeouts"] / safe_pa).fillna(0.0)
+    counts["bb_pct"] = (100.0 * counts["walks"] / safe_pa).fillna(0.0)
+    return counts
+
+
+def hitting_stats(frame, by=None, start_date=None, end_date=None):
+    """Counts and rate stats per group (one row per group; all rows if by is None).
+
+    by is a column of hits_frame() or a list of them, e.g. "opponent" or
+    ["month", "contact_type"]; start_date/end_date limit the date window.
+    """
+    if start_date is not None:
+        frame = frame[frame["date"] >= pd.Timestamp(start_date)]
+    if end_date is not None:
+        frame = frame[frame["date"] <= pd.Timestamp(end_date)]
+    if by is None:
+        counts = frame[COUNT_COLUMNS].sum().to_frame().T
+    else:
+        counts = frame.groupby(by, dropna=False, observed=True)[COUNT_COLUMNS].sum()
+    return add_rates(counts)
+
+
+def standard_metrics_table(counts):
+    # The "Standard Hitting Metrics" table shown under the spray chart, from a
+    # one-row frame of COUNT_COLUMNS (hitter aggregates or hitting_stats()).
+    if counts.empty:
+        counts = pd.DataFrame([dict.fromkeys(COUNT_COLUMNS, 0)])
+    line = add_rates(counts).iloc[0]
+    return pd.DataFrame({
+        "Metric": ["Batting Average", "Slugging Percentage", "On Base Percentage", "Walks", "Strikeouts"],
+        "Value": [f"{line['avg']:.3f}", f"{line['slg']:.3f}", f"{line['obp']:.3f}",
+                  int(line["walks"]), int(line["strikeouts"])]
+    })
+
+
+def split_table(frame, by):
+    # Display-ready split table for a single column: one row per group.
+    table = stats_table(hitting_stats(frame, by=by))
+    if isinstance(table.index, pd.CategoricalIndex):
+        # Ordered groups (e.g. spray angle) keep their order, with "—" last.
+        table.index = table.index.add_categories("—")
+    table.index = table.index.fillna("—")
+    return table
+
+
+def game_log_table(counts):
+    """One line per game, newest first, from counts indexed by (date, opponent).
+
+    counts is counts_frame(hitter_aggregates game_totals(), ["date", "opponent"])
+    or hitting_stats(frame, by=["day", "opponent"]).
+    """
+    table = stats_table(add_rates(counts)).sort_index(ascending=False)
+    table.index.names = ["Date", "Opponent"]
+    return table
+
+
+def stats_table(stats):
+    # Counts and formatted rate stats of add_rates() output, one row per group.
+    return pd.DataFrame({
+        "PA": stats["pa"].astype(int),
+        "AB": stats["at_bats"].astype(int),
+        "H": stats["hits"].astype(int),
+        "BB": stats["walks"].astype(int),
+        "K": stats["strikeouts"].astype(int),
+        "AVG": stats["avg"].map("{:.3f}".format),
+        "OBP": stats["obp"].map("{:.3f}".format),
+        "SLG": stats["slg"].map("{:.3f}".format),
+        "OPS": stats["ops"].map("{:.3f}".format),
+        "K%": stats["k_pct"].map("{:.1f}".format),
+        "BB%": stats["bb_pct"].map("{:.1f}".format),
+    })
+
+
+# =============================================================================
+# Team leaderboard
+# =============================================================================
+def counts_frame(rows, index="hitter_name"):
+    # Count rows (e.g. from hitter_aggregates) -> frame of COUNT_COLUMNS and
+    # CONTACT_COUNT_COLUMNS indexed by the given column (or list of columns).
+    index_columns = index if isinstance(index, list) else [index]
+    frame = pd.DataFrame.from_records(rows, columns=index_columns + COUNT_COLUMNS + CONTACT_COUNT_COLUMNS)
+    frame = frame.set_index(index)
+    return frame.fillna(0).astype(int)
+
+
+def leaderboard_table(counts):
+    """Slash line and contact percentages for every hitter, best OPS first."""
+    stats = add_rates(counts)
+    contact = stats["contact"].where(stats["contact"] > 0)
+    table = pd.DataFrame({
+        "PA": stats["pa"].astype(int),
+        "AVG": stats["avg"].map("{:.3f}".format),
+        "OBP": stats["obp"].map("{:.3f}".format),
+        "SLG": stats["slg"].map("{:.3f}".format),
+        "OPS": stats["ops"].map("{:.3f}".format),
+        "K%": stats["k_pct"].map("{:.1f}".format),
+        "BB%": stats["bb_pct"].map("{:.1f}".format),
+    })
+    for column, label in [("hard_hit", "Hard Hit %"), ("weak_hit", "Weak Hit %"), ("fly", "Fly Ball %"),
+                          ("line", "Line Drive %"), ("ground", "Ground Ball %")]:
+        table[label] = pd.Series(round_half_up(100.0 * stats[column] / contact), index=stats.index)
+    table = table.iloc[np.argsort(-stats["ops"].to_numpy(), kind="stable")]
+    table.index.name = "Hitter"
+    return table
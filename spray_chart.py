@@ -0,0 +1,134 @@
+"""Spray-chart rendering for the plot_hit_location stage.
+
+The field image is decoded once per process, all hits are drawn with a single
+scatter call, and the finished PNG is cached on a digest of the hit set so a
+rerun with unchanged data does not touch matplotlib at all.
+
+The density mode draws pre-binned hit counts (see hitter_aggregates.py) as a
+heatmap over the field, so its cost depends on the number of bins rather than
+the number of hits.
+"""
+import hashlib
+import io
+
+import numpy as np
+import streamlit as st
+from matplotlib.figure import Figure
+from matplotlib.lines import Line2D
+
+from diagnostics import span
+from field_image import hit_point, load_field_array
+
+# Color mapping for contact type.
+CONTACT_COLORS = {
+    "Weak Ground Ball": "#CD853F",  # light brown
+    "Hard Ground Ball": "#8B4513",  # dark brown
+    "Weak Line Drive": "#90EE90",   # light green
+    "Hard Line Drive": "#006400",   # dark green
+    "Weak Fly Ball": "#ADD8E6",     # light blue
+    "Hard Fly Ball": "#00008B"      # dark blue
+}
+UNKNOWN_CONTACT_COLOR = "red"
+DENSITY_CMAP = "YlOrRd"
+# Same output settings st.pyplot uses.
+PNG_DPI = 200
+
+
+def spray_points(hits):
+    # (x, y, contact_type) in normalized coordinates for every hit that has a location.
+    return tuple(point + (hit.get("contact_type"),)
+                 for hit, point in ((hit, hit_point(hit)) for hit in hits) if point is not None)
+
+
+def hit_set_digest(points):
+    return hashlib.sha1(repr(sorted(points, key=repr)).encode()).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def _render_spray_chart_png(hitter_name, metrics, digest, _points):
+    field = load_field_array()
+    height, width = field.shape[:2]
+    fig = Figure()
+    try:
+        ax = fig.subplots()
+        ax.imshow(field)
+        ax.axis('off')
+        ax.set_xlim(0, width)
+        ax.set_ylim(height, 0)
+        # Add the title on the image: "<Hitter Name> Spray Chart"
+        ax.set_title(f"{hitter_name} Spray Chart", fontsize=20, color='black', pad=20)
+        # Add metrics text below the title in two lines.
+        if None not in metrics:
+            hard_hit, weak_hit, fly, line, ground = metrics
+            label_line = f"{'Hard Hit':^15}{'Weak Hit':^15}{'Fly Ball':^15}{'Line Drive':^15}{'Ground Ball':^15}"
+            value_line = f"{hard_hit:}%             {weak_hit:}%             {fly:}%             {line:}%              {ground:}%"
+            ax.text(0.5, 0.99, label_line, transform=ax.transAxes, ha='center', fontsize=7, color='black')
+            ax.text(0.5, 0.95, value_line, transform=ax.transAxes, ha='center', fontsize=7, color='black')
+        # All hits in one PathCollection, colored by contact type.
+        if _points:
+            xs, ys, contact_types = zip(*_points)
+            colors = [CONTACT_COLORS.get(contact_type, UNKNOWN_CONTACT_COLOR) for contact_type in contact_types]
+            ax.scatter(np.asarray(xs, dtype=float) * width, np.asarray(ys, dtype=float) * height, c=colors, s=50,
+                       edgecolors="black", linewidths=1)
+        # Create a legend using Line2D objects with dot markers.
+        legend_elements = [
+            Line2D([0], [0], marker='o', color='w', label=label,
+                   markerfacecolor=color, markersize=8)
+            for label, color in CONTACT_COLORS.items()
+        ]
+        ax.legend(handles=legend_elements, loc="lower left", prop={'size': 8}, frameon=False)
+        buffer = io.BytesIO()
+        # Only reached on a cache miss; matplotlib does the actual drawing here.
+        with span("chart.savefig"):
+            fig.savefig(buffer, format="png", dpi=PNG_DPI, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def render_spray_chart(hitter_name, hits, metrics):
+    # Returns PNG bytes; cached on the hitter, metrics and hit-set digest.
+    with span("chart.spray"):
+        points = spray_points(hits)
+        return _render_spray_chart_png(hitter_name, tuple(metrics), hit_set_digest(points), points)
+
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def _render_density_png(title, bins_per_side, digest, _bins):
+    field = load_field_array()
+    height, width = field.shape[:2]
+    grid = np.zeros((bins_per_side, bins_per_side))
+    if _bins:
+        bin_x, bin_y, hits = (np.asarray(values) for values in zip(*_bins))
+        inside = (bin_x >= 0) & (bin_x < bins_per_side) & (bin_y >= 0) & (bin_y < bins_per_side)
+        grid[bin_y[inside], bin_x[inside]] = hits[inside]
+    fig = Figure()
+    try:
+        ax = fig.subplots()
+        ax.imshow(field)
+        ax.axis('off')
+        ax.set_xlim(0, width)
+        ax.set_ylim(height, 0)
+        ax.set_title(title, fontsize=20, color='black', pad=20)
+        density = ax.imshow(np.ma.masked_equal(grid, 0), cmap=DENSITY_CMAP, alpha=0.7,
+                            interpolation="nearest", extent=(0, width, height, 0))
+        if _bins:
+            fig.colorbar(density, ax=ax, shrink=0.6, label="Hits")
+        buffer = io.BytesIO()
+        # Only reached on a cache miss; matplotlib does the actual drawing here.
+        with span("chart.savefig"):
+            fig.savefig(buffer, format="png", dpi=PNG_DPI, bbox_inches="tight")
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+def render_density_chart(hitter_name, bins, bins_per_side, contact_type=None):
+    # bins: [(bin_x, bin_y, hits)] on a bins_per_side grid over the image;
+    # returns PNG bytes cached on the bin digest.
+    title = f"{hitter_name} Spray Density"
+    if contact_type is not None:
+        title += f"\n{contact_type}"
+    with span("chart.density"):
+        bins = tuple(sorted(bins))
+        return _render_density_png(title, bins_per_side, hashlib.sha1(repr(bins).encode()).hexdigest(), bins)
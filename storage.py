@@ -0,0 +1,686 @@
+"""Storage backends for dimensions, the hit log and hitting metrics.
+
+The app talks to a storage object rather than to BigQuery directly. Two
+implementations share the same methods:
+
+* BigQueryStorage - the hosted hit_tracker_data dataset (default).
+* LocalStorage - an embedded SQLite database for offline use at the field,
+  tests and benchmarks.
+
+Deleting an at-bat (including the delete half of an edit) only appends a
+tombstone row to hit_tombstones; reads skip tombstoned ids straight away and
+compact_deleted_hits() later purges them from fact_hit_log in one batch.
+
+One-off maintenance, run with credentials allowed to change the dataset
+(the app's own service account only reads and inserts):
+
+    python storage.py create-tables          # hit_tombstones, imported_hits; before first use
+    python storage.py partition-fact-table   # DATE-partitioned fact_hit_log
+
+The backend is picked from the [storage] section of .streamlit/secrets.toml:
+
+    [storage]
+    backend = "local"            # or "bigquery"
+    path = "at_bat_tracker.db"   # local only
+    dataset = "hit-tracker-453205.hit_tracker_data"  # bigquery only
+
+Hit coordinates are fractions of the field image (see field_image.py). To
+rewrite rows logged as raw pixels (and widen INT64 coordinate columns to
+FLOAT64, which fractional inserts need):
+
+    python storage.py normalize-coordinates
+
+Bulk import and Parquet export of the hit log live in hit_log_io.py.
+"""
+import argparse
+import collections
+import datetime
+import heapq
+import sqlite3
+import threading
+import time
+import uuid
+
+import streamlit as st
+
+from diagnostics import TimedStorage
+from field_image import LEGACY_IMAGE_SIZE
+
+DEFAULT_DATASET = "hit-tracker-453205.hit_tracker_data"
+DEFAULT_LOCAL_PATH = "at_bat_tracker.db"
+
+# Columns of fact_hit_log, in the order the app writes them.
+HIT_COLUMNS = ["id", "date", "opponent", "hitter_name", "outcome", "batted_result",
+               "contact_type", "x_coordinate", "y_coordinate"]
+# BigQuery rows can't be DML-deleted while in the streaming buffer, so only
+# tombstones at least this old are compacted.
+COMPACTION_MIN_AGE_MINUTES = 90
+# Rows per Arrow record batch when exporting or importing the hit log.
+BULK_BATCH_ROWS = 50000
+
+
+def date_param(value, date_type):
+    # A date (or ISO date string) as the value of a date_type parameter.
+    if date_type == "STRING":
+        return str(value)
+    return value if isinstance(value, datetime.date) else datetime.date.fromisoformat(value)
+
+
+def hit_filters(placeholder, hitter_name, start_date=None, end_date=None, opponent=None, date_type="DATE"):
+    # WHERE clauses and (name, BigQuery type, value) parameters for hit-log
+    # reads; a None filter (including hitter_name) is left out. Dates are
+    # bound as date_type, the type of fact_hit_log.date.
+    clauses, params = [], []
+    if hitter_name is not None:
+        clauses.append(f"hitter_name = {placeholder}hitter_name")
+        params.append(("hitter_name", "STRING", hitter_name))
+    if start_date is not None:
+        clauses.append(f"date >= {placeholder}start_date")
+        params.append(("start_date", date_type, date_param(start_date, date_type)))
+    if end_date is not None:
+        clauses.append(f"date <= {placeholder}end_date")
+        params.append(("end_date", date_type, date_param(end_date, date_type)))
+    if opponent is not None:
+        clauses.append(f"opponent = {placeholder}opponent")
+        params.append(("opponent", "STRING", opponent))
+    return " AND ".join(clauses) or "TRUE", params
+
+
+def game_counts_sql(fact_table, live_filter, counters):
+    # One GROUP BY hitter/opponent/date summing each {column: SQL condition};
+    # portable between BigQuery and SQLite.
+    sums = ", ".join(f"SUM(CASE WHEN {condition} THEN 1 ELSE 0 END) AS {column}"
+                     for column, condition in counters.items())
+    return f"""
+        SELECT hitter_name, COALESCE(opponent, '') AS opponent, date, {sums}
+        FROM {fact_table} f
+        WHERE {live_filter}
+        GROUP BY hitter_name, COALESCE(opponent, ''), date
+    """
+
+
+def spray_bins_sql(fact_table, live_filter, bins):
+    # Located hits per hitter, contact type and bins x bins cell, binned like
+    # hitter_aggregates.spray_bin() (legacy pixel rows are scaled first).
+    legacy = "x_coordinate > 1 OR y_coordinate > 1"
+
+    def cell(column, size):
+        value = f"(CASE WHEN {legacy} THEN {column} / {float(size)} ELSE {column} END)"
+        return f"CASE WHEN {value} >= 1 THEN {bins - 1} ELSE CAST(TRUNC({value} * {bins}) AS INTEGER) END"
+
+    return f"""
+        SELECT hitter_name, contact_type, bin_x, bin_y, COUNT(*) AS hits
+        FROM (
+          SELECT hitter_name, COALESCE(contact_type, '') AS contact_type,
+                 {cell("x_coordinate", LEGACY_IMAGE_SIZE[0])} AS bin_x,
+                 {cell("y_coordinate", LEGACY_IMAGE_SIZE[1])} AS bin_y
+          FROM {fact_table} f
+          WHERE x_coordinate IS NOT NULL AND y_coordinate IS NOT NULL AND {live_filter}
+        ) located
+        GROUP BY hitter_name, contact_type, bin_x, bin_y
+    """
+
+
+def hit_arrow_schema():
+    # Arrow schema of fact_hit_log, for Parquet import/export.
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.string()),
+        ("date", pa.date32()),
+        ("opponent", pa.string()),
+        ("hitter_name", pa.string()),
+        ("outcome", pa.string()),
+        ("batted_result", pa.string()),
+        ("contact_type", pa.string()),
+        ("x_coordinate", pa.float64()),
+        ("y_coordinate", pa.float64()),
+    ])
+
+
+def history_key(hit):
+    # Newest-first keyset ordering for the at-bat history: (date, id).
+    return str(hit.get("date")), hit["id"]
+
+
+def history_page(hits, page_size, cursor=None):
+    # The newest page_size of hits older than cursor (a history_key()), newest first.
+    if cursor is not None:
+        hits = [hit for hit in hits if history_key(hit) < tuple(cursor)]
+    return heapq.nlargest(page_size, hits, key=history_key)
+
+
+def merged_history_page(storage, hitter_name, page_size, cursor=None, pending=()):
+    # A keyset page of the stored at-bats merged with ones not stored yet
+    # (e.g. the journal's); a pending row already stored is shown once.
+    stored = storage.load_hits_page(hitter_name, page_size, cursor)
+    stored_ids = {hit["id"] for hit in stored}
+    return history_page(stored + [hit for hit in pending if hit["id"] not in stored_ids], page_size, cursor)
+
+
+class BigQueryStorage:
+    # Bytes processed / cache hits of recent queries, newest last.
+    QUERY_LOG_SIZE = 200
+
+    def __init__(self, dataset=DEFAULT_DATASET):
+        self.dataset = dataset
+        self.query_log = collections.deque(maxlen=self.QUERY_LOG_SIZE)
+        self._pool = None
+        self._fact_date_type = None
+
+    @property
+    def pool(self):
+        # Resolved lazily so the app can start without BigQuery credentials.
+        if self._pool is None:
+            from bigquery_pool import get_client_pool
+            self._pool = get_client_pool()
+        return self._pool
+
+    def table(self, name):
+        return f"{self.dataset}.{name}"
+
+    def _query(self, name, query, params=(), page_size=None, stream=False):
+        # With stream=True the RowIterator is returned unread, so large
+        # results can be consumed page by page.
+        from google.cloud import bigquery
+        job_config = bigquery.QueryJobConfig(query_parameters=[
+            bigquery.ScalarQueryParameter(param_name, param_type, value)
+            for param_name, param_type, value in params
+        ])
+
+        def run():
+            started = time.perf_counter()
+            job = self.pool.get().query(query, job_config=job_config)
+            rows = job.result(page_size=page_size)
+            if not stream:
+                rows = list(rows)
+            self.query_log.append({
+                "query": name,
+                "bytes_processed": job.total_bytes_processed or 0,
+                "cache_hit": bool(job.cache_hit),
+                "seconds": time.perf_counter() - started,
+            })
+            return rows
+
+        return self.pool.call(run)
+
+    def _insert(self, table_name, rows, row_ids=None):
+        return self.pool.call(lambda: self.pool.get().insert_rows_json(
+            self.table(table_name), rows, row_ids=row_ids))
+
+    def _column_types(self, table_name):
+        # {column: BigQuery type} from the table's schema (a metadata call, not a query).
+        table = self.pool.call(lambda: self.pool.get().get_table(self.table(table_name)))
+        return {field.name: field.field_type for field in table.schema}
+
+    def _date_type(self):
+        # fact_hit_log.date is STRING in the baseline dataset and DATE once
+        # partition_fact_table() has run; BigQuery won't compare the two, so
+        # date parameters are bound to match. Read once per process.
+        if self._fact_date_type is None:
+            date_type = self._column_types("fact_hit_log").get("date")
+            self._fact_date_type = "STRING" if date_type == "STRING" else "DATE"
+        return self._fact_date_type
+
+    def _live_hits_filter(self):
+        return (f"NOT EXISTS (SELECT 1 FROM `{self.table('hit_tombstones')}` t"
+                f" WHERE t.hit_id = f.id)")
+
+    def load_opponents(self):
+        return [row.opponent for row in self._query(
+            "load_opponents", f"SELECT opponent FROM `{self.table('dim_opponents')}`")]
+
+    def load_hitters(self):
+        return [row.hitter for row in self._query(
+            "load_hitters", f"SELECT hitter FROM `{self.table('dim_hitters')}`")]
+
+    # The value doubles as insertId, so a retried insert can't add a duplicate.
+    def save_opponent(self, opponent):
+        return self._insert("dim_opponents", [{"opponent": opponent}], row_ids=[opponent])
+
+    def save_hitter(self, hitter):
+        return self._insert("dim_hitters", [{"hitter": hitter}], row_ids=[hitter])
+
+    def insert_hits(self, rows):
+        # The hit id doubles as insertId so retried batches are de-duplicated.
+        return self._insert("fact_hit_log", rows, row_ids=[row["id"] for row in rows])
+
+    def load_hits(self, hitter_name, start_date=None, end_date=None, opponent=None):
+        where, params = hit_filters("@", hitter_name, start_date, end_date, opponent, self._date_type())
+        query = f"""
+            SELECT {', '.join(HIT_COLUMNS)}
+            FROM `{self.table('fact_hit_log')}` f
+            WHERE {where} AND {self._live_hits_filter()}
+        """
+        return [dict(row) for row in self._query("load_hits", query, params)]
+
+    def load_hits_page(self, hitter_name, page_size, cursor=None):
+        # Keyset page ordered by (date, id) newest first; cursor is the last
+        # history_key() of the previous page.
+        params = [("hitter_name", "STRING", hitter_name), ("page_size", "INT64", page_size)]
+        after = ""
+        if cursor is not None:
+            after = "AND (date < @cursor_date OR (date = @cursor_date AND id < @cursor_id))"
+            date_type = self._date_type()
+            params += [("cursor_date", date_type, date_param(cursor[0], date_type)),
+                       ("cursor_id", "STRING", cursor[1])]
+        query = f"""
+            SELECT {', '.join(HIT_COLUMNS)}
+            FROM `{self.table('fact_hit_log')}` f
+            WHERE hitter_name = @hitter_name {after} AND {self._live_hits_filter()}
+            ORDER BY date DESC, id DESC
+            LIMIT @page_size
+        """
+        return [dict(row) for row in self._query("load_hits_page", query, params)]
+
+    def count_hits(self, hitter_name):
+        query = f"""
+            SELECT COUNT(*) AS n
+            FROM `{self.table('fact_hit_log')}` f
+            WHERE hitter_name = @hitter_name AND {self._live_hits_filter()}
+        """
+        for row in self._query("count_hits", query, [("hitter_name", "STRING", hitter_name)]):
+            return row.n
+        return 0
+
+    def load_game_counts(self, counters):
+        # Per hitter/opponent/date counts for rebuilding hitter aggregates,
+        # summed server-side so no hit rows are downloaded.
+        query = game_counts_sql(f"`{self.table('fact_hit_log')}`", self._live_hits_filter(), counters)
+        return [dict(row) for row in self._query("load_game_counts", query)]
+
+    def load_spray_bin_counts(self, bins):
+        query = spray_bins_sql(f"`{self.table('fact_hit_log')}`", self._live_hits_filter(), bins)
+        return [dict(row) for row in self._query("load_spray_bin_counts", query)]
+
+    def load_contact_metrics(self, hitter_name):
+        query = f"""
+            SELECT
+              `Hard Hit %` as hard_hit,
+              `Weak Hit %` as weak_hit,
+              `Fly Ball %` as fly,
+              `Line Drive %` as line,
+              `Ground Ball %` as ground
+            FROM `{self.table('vw_hitting_metrics')}`
+            WHERE hitter_name = @hitter_name
+        """
+        for row in self._query("load_contact_metrics", query, [("hitter_name", "STRING", hitter_name)]):
+            return row.hard_hit, row.weak_hit, row.fly, row.line, row.ground
+        return None, None, None, None, None
+
+    def delete_hit(self, hit_id):
+        # Appends a tombstone (hit id as insertId); the row is purged by compaction.
+        tombstone = {"hit_id": hit_id,
+                     "deleted_at": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+        errors = self._insert("hit_tombstones", [tombstone], row_ids=[hit_id])
+        if errors:
+            raise RuntimeError(f"Error recording delete: {errors}")
+
+    def compact_deleted_hits(self, min_age_minutes=COMPACTION_MIN_AGE_MINUTES):
+        # Purges tombstoned rows in one DML statement, then drops those tombstones.
+        query = f"""
+            DECLARE cutoff TIMESTAMP DEFAULT
+              TIMESTAMP_SUB(CURRENT_TIMESTAMP(), INTERVAL @min_age_minutes MINUTE);
+            DELETE FROM `{self.table('fact_hit_log')}`
+            WHERE id IN (SELECT hit_id FROM `{self.table('hit_tombstones')}` WHERE deleted_at < cutoff);
+            DELETE FROM `{self.table('hit_tombstones')}` WHERE deleted_at < cutoff;
+        """
+        self._query("compact_deleted_hits", query, [("min_age_minutes", "INT64", min_age_minutes)])
+
+    def export_hit_batches(self, hitter_name=None, start_date=None, end_date=None, opponent=None,
+                           batch_size=BULK_BATCH_ROWS):
+        # Live rows matching the filters as Arrow record batches, one result page at a time.
+        import pyarrow as pa
+        where, params = hit_filters("@", hitter_name, start_date, end_date, opponent, self._date_type())
+        query = f"""
+            SELECT {', '.join(HIT_COLUMNS)}
+            FROM `{self.table('fact_hit_log')}` f
+            WHERE {where} AND {self._live_hits_filter()}
+            ORDER BY date, id
+        """
+        schema = hit_arrow_schema()
+        rows = self._query("export_hit_batches", query, params, page_size=batch_size, stream=True)
+        for batch in rows.to_arrow_iterable():
+            yield from pa.Table.from_batches([batch]).cast(schema).to_batches()
+
+    def import_hits_parquet(self, path):
+        """Append the rows of a Parquet file (hit_arrow_schema()) with one load job.
+
+        The file is loaded into a staging table, and one script copies over
+        the rows whose id is not stored, tombstoned or recorded in
+        imported_hits by an earlier import, then records the file's ids there.
+        A re-imported file is a no-op, and at-bats deleted since the last
+        import stay deleted after compaction. Returns the number of rows added.
+        """
+        from google.cloud import bigquery
+        staging = self.table(f"fact_hit_log_import_{uuid.uuid4().hex[:12]}")
+        job_config = bigquery.LoadJobConfig(source_format=bigquery.SourceFormat.PARQUET,
+                                            write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE)
+
+        def load():
+            with open(path, "rb") as source:
+                self.pool.get().load_table_from_file(source, staging, job_config=job_config).result()
+
+        # Parquet dates load as DATE; an unpartitioned fact_hit_log stores them as STRING.
+        date = "CAST(date AS STRING)" if self._date_type() == "STRING" else "date"
+        columns = ", ".join(date + " AS date" if column == "date" else column for column in HIT_COLUMNS)
+        query = f"""
+            CREATE TEMP TABLE new_hits AS
+            SELECT {columns} FROM `{staging}` s
+            WHERE NOT EXISTS (SELECT 1 FROM `{self.table('fact_hit_log')}` f WHERE f.id = s.id)
+              AND NOT EXISTS (SELECT 1 FROM `{self.table('hit_tombstones')}` t WHERE t.hit_id = s.id)
+              AND NOT EXISTS (SELECT 1 FROM `{self.table('imported_hits')}` i WHERE i.hit_id = s.id);
+            BEGIN TRANSACTION;
+            INSERT INTO `{self.table('fact_hit_log')}` ({', '.join(HIT_COLUMNS)})
+            SELECT {', '.join(HIT_COLUMNS)} FROM new_hits;
+            INSERT INTO `{self.table('imported_hits')}` (hit_id, imported_at)
+            SELECT DISTINCT id, CURRENT_TIMESTAMP() FROM `{staging}` s
+            WHERE NOT EXISTS (SELECT 1 FROM `{self.table('imported_hits')}` i WHERE i.hit_id = s.id);
+            COMMIT TRANSACTION;
+            SELECT COUNT(*) AS added FROM new_hits;
+        """
+        try:
+            self.pool.call(load)
+            for row in self._query("import_hits_parquet", query):
+                return row.added
+            return 0
+        finally:
+            self.pool.call(lambda: self.pool.get().delete_table(staging, not_found_ok=True))
+
+    def create_tables(self):
+        """Create the tables the app adds next to the baseline dataset.
+
+        A one-off setup step (`python storage.py create-tables`), so the app's
+        service account never needs bigquery.tables.create; hit-log reads
+        fail until it has run.
+        """
+        from google.cloud import bigquery
+        tables = [
+            bigquery.Table(self.table("hit_tombstones"), schema=[
+                bigquery.SchemaField("hit_id", "STRING", mode="REQUIRED"),
+                bigquery.SchemaField("deleted_at", "TIMESTAMP", mode="REQUIRED"),
+            ]),
+            # Ids brought in by import_hits_parquet(), so a re-import can't
+            # bring back at-bats deleted (and compacted) since.
+            bigquery.Table(self.table("imported_hits"), schema=[
+                bigquery.SchemaField("hit_id", "STRING", mode="REQUIRED"),
+                bigquery.SchemaField("imported_at", "TIMESTAMP", mode="REQUIRED"),
+            ]),
+        ]
+        for table in tables:
+            self.pool.call(lambda: self.pool.get().create_table(table, exists_ok=True))
+
+    def normalize_hit_coordinates(self, width=LEGACY_IMAGE_SIZE[0], height=LEGACY_IMAGE_SIZE[1]):
+        """Rewrite pixel hit coordinates as fractions of a width x height image.
+
+        The baseline table stored coordinates as INT64, which can hold neither
+        the fractions nor the app's new inserts, so such columns are widened
+        to FLOAT64 first. Idempotent: rows already normalized (both values at
+        most 1) are left alone. DML fails on rows still in the streaming
+        buffer, so run it once the last pixel rows are older than
+        COMPACTION_MIN_AGE_MINUTES.
+        """
+        types = self._column_types("fact_hit_log")
+        for column in ["x_coordinate", "y_coordinate"]:
+            if types.get(column) in ("INTEGER", "INT64"):
+                self._query(f"widen_{column}", f"""
+                    ALTER TABLE `{self.table('fact_hit_log')}` ALTER COLUMN {column} SET DATA TYPE FLOAT64
+                """)
+        query = f"""
+            UPDATE `{self.table('fact_hit_log')}`
+            SET x_coordinate = x_coordinate / @width, y_coordinate = y_coordinate / @height
+            WHERE x_coordinate > 1 OR y_coordinate > 1
+        """
+        self._query("normalize_hit_coordinates", query,
+                    [("width", "FLOAT64", float(width)), ("height", "FLOAT64", float(height))])
+
+    def partition_fact_table(self):
+        """Rebuild fact_hit_log partitioned by date and clustered by hitter_name.
+
+        BigQuery cannot re-partition a table in place, so the rows are copied
+        into a new table which then takes over the fact_hit_log name; the old
+        table is kept as fact_hit_log_unpartitioned until it is dropped by
+        hand. Run it while nothing is streaming into the table (pause the
+        write-behind journal), since renames fail on a table with a streaming
+        buffer.
+        """
+        fact_table = self.table("fact_hit_log")
+        new_table = self.table("fact_hit_log_partitioned")
+        query = f"""
+            CREATE TABLE `{new_table}`
+            PARTITION BY date
+            CLUSTER BY hitter_name
+            AS SELECT * REPLACE (CAST(date AS DATE) AS date) FROM `{fact_table}`;
+            ALTER TABLE `{fact_table}` RENAME TO fact_hit_log_unpartitioned;
+            ALTER TABLE `{new_table}` RENAME TO fact_hit_log;
+        """
+        self._query("partition_fact_table", query)
+        self._fact_date_type = None
+
+    def query_stats(self):
+        # Totals over the recent query log, for watching scan cost.
+        entries = list(self.query_log)
+        return {
+            "queries": len(entries),
+            "bytes_processed": sum(entry["bytes_processed"] for entry in entries),
+            "cache_hits": sum(entry["cache_hit"] for entry in entries),
+        }
+
+
+class LocalStorage:
+    LIVE_HITS_FILTER = "NOT EXISTS (SELECT 1 FROM hit_tombstones t WHERE t.hit_id = f.id)"
+    # Mirrors vw_hitting_metrics: each share is a percentage of the hitter's
+    # batted balls that have a contact type, rounded to one decimal.
+    CONTACT_METRICS_SQL = """
+        SELECT
+          ROUND(100.0 * SUM(contact_type LIKE 'Hard %') / COUNT(*), 1),
+          ROUND(100.0 * SUM(contact_type LIKE 'Weak %') / COUNT(*), 1),
+          ROUND(100.0 * SUM(contact_type LIKE '% Fly Ball') / COUNT(*), 1),
+          ROUND(100.0 * SUM(contact_type LIKE '% Line Drive') / COUNT(*), 1),
+          ROUND(100.0 * SUM(contact_type LIKE '% Ground Ball') / COUNT(*), 1)
+        FROM fact_hit_log f
+        WHERE hitter_name = ? AND contact_type IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM hit_tombstones t WHERE t.hit_id = f.id)
+        HAVING COUNT(*) > 0
+    """
+
+    def __init__(self, path=DEFAULT_LOCAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS dim_opponents (opponent TEXT PRIMARY KEY)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS dim_hitters (hitter TEXT PRIMARY KEY)")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fact_hit_log ("
+                " id TEXT PRIMARY KEY, date TEXT, opponent TEXT, hitter_name TEXT,"
+                " outcome TEXT, batted_result TEXT, contact_type TEXT,"
+                " x_coordinate REAL, y_coordinate REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS ix_fact_hit_log_hitter"
+                               " ON fact_hit_log (hitter_name, date)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS hit_tombstones"
+                               " (hit_id TEXT PRIMARY KEY, deleted_at TEXT NOT NULL)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS imported_hits"
+                               " (hit_id TEXT PRIMARY KEY, imported_at TEXT NOT NULL)")
+
+    def _execute(self, query, params=()):
+        with self._lock, self._conn:
+            return self._conn.execute(query, params).fetchall()
+
+    def _executemany(self, query, params):
+        with self._lock, self._conn:
+            self._conn.executemany(query, params)
+
+    def load_opponents(self):
+        return [row["opponent"] for row in self._execute("SELECT opponent FROM dim_opponents")]
+
+    def load_hitters(self):
+        return [row["hitter"] for row in self._execute("SELECT hitter FROM dim_hitters")]
+
+    def save_opponent(self, opponent):
+        self._execute("INSERT OR IGNORE INTO dim_opponents (opponent) VALUES (?)", (opponent,))
+        return []
+
+    def save_hitter(self, hitter):
+        self._execute("INSERT OR IGNORE INTO dim_hitters (hitter) VALUES (?)", (hitter,))
+        return []
+
+    def insert_hits(self, rows):
+        placeholders = ", ".join("?" for _ in HIT_COLUMNS)
+        self._executemany(
+            f"INSERT OR REPLACE INTO fact_hit_log ({', '.join(HIT_COLUMNS)}) VALUES ({placeholders})",
+            [tuple(row.get(column) for column in HIT_COLUMNS) for row in rows],
+        )
+        return []
+
+    def load_hits(self, hitter_name, start_date=None, end_date=None, opponent=None):
+        where, params = hit_filters(":", hitter_name, start_date, end_date, opponent)
+        rows = self._execute(f"SELECT {', '.join(HIT_COLUMNS)} FROM fact_hit_log f WHERE {where}"
+                             " AND NOT EXISTS (SELECT 1 FROM hit_tombstones t WHERE t.hit_id = f.id)",
+                             {name: str(value) if name.endswith("_date") else value
+                              for name, _, value in params})
+        return [dict(row) for row in rows]
+
+    def load_hits_page(self, hitter_name, page_size, cursor=None):
+        after, params = "", {"hitter_name": hitter_name, "page_size": page_size}
+        if cursor is not None:
+            after = "AND (date < :cursor_date OR (date = :cursor_date AND id < :cursor_id))"
+            params.update(cursor_date=cursor[0], cursor_id=cursor[1])
+        rows = self._execute(
+            f"SELECT {', '.join(HIT_COLUMNS)} FROM fact_hit_log f"
+            f" WHERE hitter_name = :hitter_name {after}"
+            " AND NOT EXISTS (SELECT 1 FROM hit_tombstones t WHERE t.hit_id = f.id)"
+            " ORDER BY date DESC, id DESC LIMIT :page_size",
+            params,
+        )
+        return [dict(row) for row in rows]
+
+    def count_hits(self, hitter_name):
+        return self._execute(
+            "SELECT COUNT(*) FROM fact_hit_log f WHERE hitter_name = ?"
+            " AND NOT EXISTS (SELECT 1 FROM hit_tombstones t WHERE t.hit_id = f.id)",
+            (hitter_name,),
+        )[0][0]
+
+    def load_game_counts(self, counters):
+        rows = self._execute(game_counts_sql("fact_hit_log", self.LIVE_HITS_FILTER, counters))
+        return [dict(row) for row in rows]
+
+    def load_spray_bin_counts(self, bins):
+        return [dict(row) for row in self._execute(spray_bins_sql("fact_hit_log", self.LIVE_HITS_FILTER, bins))]
+
+    def load_contact_metrics(self, hitter_name):
+        for row in self._execute(self.CONTACT_METRICS_SQL, (hitter_name,)):
+            return tuple(row)
+        return None, None, None, None, None
+
+    def delete_hit(self, hit_id):
+        self._execute("INSERT OR IGNORE INTO hit_tombstones (hit_id, deleted_at) VALUES (?, ?)",
+                      (hit_id, datetime.datetime.now(datetime.timezone.utc).isoformat()))
+
+    def compact_deleted_hits(self, min_age_minutes=0):
+        # No streaming buffer locally, so tombstones can be purged at any age.
+        cutoff = (datetime.datetime.now(datetime.timezone.utc)
+                  - datetime.timedelta(minutes=min_age_minutes)).isoformat()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM fact_hit_log WHERE id IN"
+                               " (SELECT hit_id FROM hit_tombstones WHERE deleted_at <= ?)", (cutoff,))
+            self._conn.execute("DELETE FROM hit_tombstones WHERE deleted_at <= ?", (cutoff,))
+
+    def export_hit_batches(self, hitter_name=None, start_date=None, end_date=None, opponent=None,
+                           batch_size=BULK_BATCH_ROWS):
+        import pyarrow as pa
+        where, params = hit_filters(":", hitter_name, start_date, end_date, opponent)
+        schema = hit_arrow_schema()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"SELECT {', '.join(HIT_COLUMNS)} FROM fact_hit_log f WHERE {where}"
+                " AND NOT EXISTS (SELECT 1 FROM hit_tombstones t WHERE t.hit_id = f.id) ORDER BY date, id",
+                {name: str(value) if name.endswith("_date") else value for name, _, value in params})
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            columns = {column: [row[column] for row in rows] for column in HIT_COLUMNS}
+            columns["date"] = [datetime.date.fromisoformat(str(value)[:10]) if value else None
+                               for value in columns["date"]]
+            yield pa.RecordBatch.from_pydict(columns, schema=schema)
+
+    def import_hits_parquet(self, path):
+        # Rows whose id is stored, tombstoned or imported before are skipped,
+        # and every id is recorded in imported_hits; returns the number added.
+        import pyarrow.parquet as pq
+        placeholders = ", ".join(f":{column}" for column in HIT_COLUMNS)
+        imported_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        added = 0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=BULK_BATCH_ROWS):
+            rows = [dict(row, date=str(row["date"])) for row in batch.to_pylist()]
+            with self._lock, self._conn:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO fact_hit_log ({', '.join(HIT_COLUMNS)}) SELECT {placeholders}"
+                    " WHERE NOT EXISTS (SELECT 1 FROM hit_tombstones WHERE hit_id = :id)"
+                    " AND NOT EXISTS (SELECT 1 FROM imported_hits WHERE hit_id = :id)", rows)
+                added += self._conn.total_changes - before
+                self._conn.executemany("INSERT OR IGNORE INTO imported_hits (hit_id, imported_at) VALUES (?, ?)",
+                                       [(row["id"], imported_at) for row in rows])
+        return added
+
+    def create_tables(self):
+        # Every table is created when the database is opened.
+        pass
+
+    def partition_fact_table(self):
+        # SQLite has no partitioning; the (hitter_name, date) index serves the same reads.
+        pass
+
+    def normalize_hit_coordinates(self, width=LEGACY_IMAGE_SIZE[0], height=LEGACY_IMAGE_SIZE[1]):
+        self._execute("UPDATE fact_hit_log SET x_coordinate = x_coordinate / ?, y_coordinate = y_coordinate / ?"
+                      " WHERE x_coordinate > 1 OR y_coordinate > 1", (float(width), float(height)))
+
+
+def load_storage_config():
+    try:
+        return dict(st.secrets.get("storage", {}))
+    except Exception:
+        return {}
+
+
+def create_storage(config):
+    backend = config.get("backend", "bigquery")
+    if backend == "bigquery":
+        return BigQueryStorage(config.get("dataset", DEFAULT_DATASET))
+    if backend == "local":
+        return LocalStorage(config.get("path", DEFAULT_LOCAL_PATH))
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+@st.cache_resource(show_spinner=False)
+def get_storage():
+    # Calls through the shared backend are recorded as diagnostics spans.
+    return TimedStorage(create_storage(load_storage_config()))
+
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintenance tasks for the configured storage backend.")
+    parser.add_argument("command", choices=["create-tables", "partition-fact-table", "normalize-coordinates"])
+    args = parser.parse_args()
+    storage = create_storage(load_storage_config())
+    if args.command == "create-tables":
+        storage.create_tables()
+        print("Tables created")
+    elif args.command == "partition-fact-table":
+        storage.partition_fact_table()
+        print("fact_hit_log partitioned by date")
+    elif args.command == "normalize-coordinates":
+        storage.normalize_hit_coordinates()
+        print("Hit coordinates normalized")
+
+
+if __name__ == "__main__":
+    main()
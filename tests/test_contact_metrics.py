@@ -0,0 +1,70 @@
+"""contact_percentages() must agree with the SQL port of vw_hitting_metrics.
+
+Both are run on the same hit sets: LocalStorage.CONTACT_METRICS_SQL through
+load_contact_metrics(), and hitting_metrics.contact_percentages() on the rows.
+"""
+import random
+import uuid
+
+import pytest
+
+from hit_outcomes import CONTACT_TYPES, OUTCOMES
+from hitting_metrics import contact_percentages
+from storage import LocalStorage
+
+HITTER = "Parity Hitter"
+
+
+def make_hits(contact_types, no_contact=0):
+    # One batted ball per contact type given, plus no_contact walks/strikeouts.
+    hits = [{"id": str(uuid.uuid4()), "date": "2024-05-01", "opponent": "Rivals", "hitter_name": HITTER,
+             "outcome": "Batted Ball", "batted_result": "Single", "contact_type": contact,
+             "x_coordinate": 0.5, "y_coordinate": 0.4} for contact in contact_types]
+    hits += [{"id": str(uuid.uuid4()), "date": "2024-05-01", "opponent": "Rivals", "hitter_name": HITTER,
+              "outcome": outcome, "batted_result": None, "contact_type": None,
+              "x_coordinate": None, "y_coordinate": None}
+             for outcome in (OUTCOMES[index % 3] for index in range(no_contact))]
+    return hits
+
+
+def view_metrics(hits):
+    storage = LocalStorage(":memory:")
+    storage.insert_hits(hits)
+    return storage.load_contact_metrics(HITTER)
+
+
+def assert_parity(hits):
+    assert contact_percentages(hits) == view_metrics(hits)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_random_hit_sets(seed):
+    rng = random.Random(seed)
+    contact = rng.choices(CONTACT_TYPES, k=rng.randint(1, 120))
+    assert_parity(make_hits(contact, no_contact=rng.randint(0, 30)))
+
+
+@pytest.mark.parametrize("hard, total, expected", [
+    (1, 16, 6.3), (3, 16, 18.8), (5, 16, 31.3), (9, 16, 56.3), (13, 16, 81.3),
+    (1, 80, 1.3), (3, 80, 3.8), (7, 80, 8.8),
+])
+def test_halves_round_up(hard, total, expected):
+    # 100 * hard / total ends in 5 at the second decimal, e.g. 6.25 -> 6.3.
+    hits = make_hits(["Hard Fly Ball"] * hard + ["Weak Ground Ball"] * (total - hard), no_contact=3)
+    assert_parity(hits)
+    assert contact_percentages(hits)[0] == expected
+
+
+def test_no_contact_types():
+    # Like the view returning no row for the hitter.
+    hits = make_hits([], no_contact=5)
+    assert contact_percentages(hits) == (None, None, None, None, None)
+    assert_parity(hits)
+
+
+def test_deleted_rows_are_left_out():
+    hits = make_hits(["Hard Line Drive", "Weak Fly Ball", "Weak Fly Ball"])
+    storage = LocalStorage(":memory:")
+    storage.insert_hits(hits)
+    storage.delete_hit(hits[0]["id"])
+    assert storage.load_contact_metrics(HITTER) == contact_percentages(hits[1:])
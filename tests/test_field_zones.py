@@ -0,0 +1,32 @@
+"""Zone features of hit locations and the splits built on them."""
+import math
+
+from field_image import load_field_array
+from field_zones import DEPTHS, HOME_PLATE, SPRAY_ANGLE_LABELS, ZONES, add_zone_columns, compute_zone_maps
+from hitting_metrics import SPLITS, hits_frame, split_table
+
+
+def hit_at(index, angle, radius=0.3):
+    # A batted ball angle degrees from the line through second base (None: no location).
+    x = y = None
+    if angle is not None:
+        x = HOME_PLATE[0] + radius * math.sin(math.radians(angle))
+        y = HOME_PLATE[1] - radius * math.cos(math.radians(angle))
+    return {"id": str(index), "date": "2024-05-01", "hitter_name": "Zone Hitter", "opponent": "Rivals",
+            "outcome": "Batted Ball", "batted_result": "Single", "contact_type": "Hard Line Drive",
+            "x_coordinate": x, "y_coordinate": y}
+
+
+def test_spray_angle_split_runs_left_to_right():
+    angles = [40, -5, 20, -40, None, -20, 5, 60]
+    frame = add_zone_columns(hits_frame([hit_at(index, angle) for index, angle in enumerate(angles)]))
+    table = split_table(frame, SPLITS["Spray Angle"])
+    assert list(table.index) == SPRAY_ANGLE_LABELS + ["—"]
+    # The foul ball and the hit without a location have no spray-angle bin.
+    assert table.loc["—", "PA"] == 2
+
+
+def test_foul_territory_has_foul_depth():
+    zone, _, _, depth = compute_zone_maps(load_field_array())
+    foul = zone == ZONES.index("Foul")
+    assert ((depth == DEPTHS.index("Foul")) == foul).all()
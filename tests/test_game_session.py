@@ -0,0 +1,121 @@
+"""GameSession: batting order, outs, undo, batched commits and the box score."""
+import pytest
+
+from game_session import GameSession
+
+LINEUP = ["Leadoff", "Second", "Third"]
+
+
+def at_bat(hitter, outcome, batted_result=None):
+    return {"id": f"{hitter}-{outcome}-{batted_result}", "hitter_name": hitter, "outcome": outcome,
+            "batted_result": batted_result}
+
+
+def play(game, outcome, batted_result=None):
+    # Records an at-bat for whoever is up; True once the half-inning has three outs.
+    return game.record(at_bat(game.current_batter(), outcome, batted_result))
+
+
+@pytest.fixture
+def game():
+    return GameSession("2024-05-01", "Rivals", LINEUP)
+
+
+def test_batting_order_wraps_around(game):
+    assert (game.current_batter(), game.on_deck()) == ("Leadoff", "Second")
+    for _ in range(3):
+        play(game, "Walk")
+    assert (game.current_batter(), game.on_deck()) == ("Leadoff", "Second")
+    play(game, "Walk")
+    assert (game.current_batter(), game.on_deck()) == ("Second", "Third")
+
+
+def test_counts_strikeouts_and_batted_outs(game):
+    assert play(game, "Strikeout Looking") is False
+    assert play(game, "Batted Ball", "Single") is False
+    assert play(game, "Walk") is False
+    assert play(game, "Batted Ball", "Error") is False
+    assert play(game, "Batted Ball", "Out") is False
+    assert game.outs == 2
+    assert play(game, "Strikeout Swinging") is True
+
+
+def test_third_out_commits_the_half_inning(game):
+    # What the app does when record() reports the third out.
+    batches = []
+    plays = [("Strikeout Looking",), ("Walk",), ("Batted Ball", "Out"), ("Batted Ball", "Single"),
+             ("Strikeout Swinging",)]
+    assert [play(game, *outcome) for outcome in plays] == [False, False, False, False, True]
+    assert game.end_half_inning(batches.append) == 5
+    assert [len(batch) for batch in batches] == [5]
+    assert (game.inning, game.outs, game.pending) == (2, 0, [])
+    assert len(game.committed) == 5
+    # The order carries on into the next inning.
+    assert game.current_batter() == "Third"
+
+
+def test_failed_commit_keeps_at_bats_pending(game):
+    def offline(batch):
+        raise ConnectionError("no network")
+    play(game, "Walk")
+    with pytest.raises(ConnectionError):
+        game.commit(offline)
+    assert len(game.pending) == 1 and game.committed == []
+
+
+def test_undo_takes_back_the_last_pending_at_bat(game):
+    play(game, "Walk")
+    play(game, "Strikeout Looking")
+    undone = game.undo()
+    assert undone["outcome"] == "Strikeout Looking"
+    assert (game.outs, game.current_batter(), len(game.pending)) == (0, "Second", 1)
+
+
+def test_undo_stops_at_the_last_commit(game):
+    play(game, "Strikeout Looking")
+    game.commit(lambda batch: None)
+    assert game.undo() is None
+    assert (game.outs, game.current_batter(), len(game.committed)) == (1, "Second", 1)
+    play(game, "Walk")
+    assert game.undo()["outcome"] == "Walk"
+    assert game.undo() is None
+    assert game.current_batter() == "Second"
+
+
+def test_commit_with_nothing_pending_sends_nothing(game):
+    batches = []
+    assert game.commit(batches.append) == 0
+    assert batches == []
+
+
+def test_box_score(game):
+    play(game, "Batted Ball", "Double")   # Leadoff
+    play(game, "Walk")                    # Second
+    play(game, "Strikeout Swinging")      # Third
+    game.commit(lambda batch: None)
+    play(game, "Batted Ball", "Homerun")  # Leadoff, still pending
+    play(game, "Batted Ball", "Out")      # Second
+    rows = {row["Hitter"]: row for row in game.box_score()}
+    assert list(rows) == LINEUP + ["Team"]
+    assert rows["Leadoff"] == {"Hitter": "Leadoff", "PA": 2, "AB": 2, "H": 2, "TB": 6, "BB": 0, "K": 0,
+                               "AVG": "1.000"}
+    # A walk is a PA but not an AB.
+    assert rows["Second"] == {"Hitter": "Second", "PA": 2, "AB": 1, "H": 0, "TB": 0, "BB": 1, "K": 0,
+                              "AVG": "0.000"}
+    assert rows["Third"] == {"Hitter": "Third", "PA": 1, "AB": 1, "H": 0, "TB": 0, "BB": 0, "K": 1,
+                             "AVG": "0.000"}
+    assert rows["Team"] == {"Hitter": "Team", "PA": 5, "AB": 4, "H": 2, "TB": 6, "BB": 1, "K": 1,
+                            "AVG": "0.500"}
+
+
+def test_box_score_before_anyone_bats(game):
+    rows = game.box_score()
+    assert [row["Hitter"] for row in rows] == LINEUP + ["Team"]
+    assert all(row["PA"] == 0 and row["AVG"] == "—" for row in rows)
+
+
+def test_box_score_keeps_a_substitute(game):
+    game.record(at_bat("Pinch Hitter", "Batted Ball", "Single"))
+    rows = {row["Hitter"]: row for row in game.box_score()}
+    assert rows["Pinch Hitter"]["H"] == 1
+    assert rows["Team"]["H"] == 1
@@ -0,0 +1,73 @@
+"""Keyset paging of the at-bat history: stored pages merged with pending rows.
+
+Walks every page the way the app's "Older" button does (the cursor is the
+history_key() of the last row shown) and checks each at-bat appears exactly
+once, newest first.
+"""
+import random
+
+import pytest
+
+from storage import LocalStorage, history_key, history_page, merged_history_page
+
+HITTER = "Paging Hitter"
+
+
+def make_hits(rng, count, prefix, dates):
+    return [{"id": f"{prefix}-{rng.getrandbits(32):08x}-{index}", "date": rng.choice(dates),
+             "opponent": "Rivals", "hitter_name": HITTER, "outcome": "Walk", "batted_result": None,
+             "contact_type": None, "x_coordinate": None, "y_coordinate": None} for index in range(count)]
+
+
+def walk_pages(load_page, page_size):
+    pages, cursor = [], None
+    while True:
+        page = load_page(page_size, cursor)
+        if not page:
+            return pages
+        assert len(page) <= page_size
+        pages.append(page)
+        cursor = history_key(page[-1])
+
+
+def assert_walks_newest_first(pages, hits):
+    shown = [hit["id"] for page in pages for hit in page]
+    assert len(shown) == len(set(shown))
+    assert shown == [hit["id"] for hit in sorted(hits, key=history_key, reverse=True)]
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("page_size", [1, 3, 7, 20])
+def test_stored_and_pending_rows_page_once_each(seed, page_size):
+    rng = random.Random(seed)
+    # Few dates, so most page boundaries fall inside a single date.
+    dates = [f"2024-05-{day:02d}" for day in rng.sample(range(1, 29), 3)]
+    stored = make_hits(rng, rng.randint(0, 40), "stored", dates)
+    unstored = make_hits(rng, rng.randint(0, 10), "pending", dates)
+    storage = LocalStorage(":memory:")
+    storage.insert_hits(stored)
+    # Rows flushed while still listed in the journal are in both.
+    pending = unstored + rng.sample(stored, min(len(stored), 3))
+
+    pages = walk_pages(lambda size, cursor: merged_history_page(storage, HITTER, size, cursor, pending), page_size)
+    assert_walks_newest_first(pages, stored + unstored)
+    assert all(len(page) == page_size for page in pages[:-1])
+
+
+def test_deleted_rows_are_skipped():
+    rng = random.Random(1)
+    stored = make_hits(rng, 12, "stored", ["2024-05-01", "2024-05-02"])
+    storage = LocalStorage(":memory:")
+    storage.insert_hits(stored)
+    for hit in stored[::4]:
+        storage.delete_hit(hit["id"])
+    pages = walk_pages(lambda size, cursor: merged_history_page(storage, HITTER, size, cursor), 5)
+    assert_walks_newest_first(pages, [hit for index, hit in enumerate(stored) if index % 4])
+
+
+def test_cached_rows_page_like_stored_ones():
+    # The app pages an already-loaded history in memory the same way.
+    rng = random.Random(2)
+    hits = make_hits(rng, 25, "cached", ["2024-05-01", "2024-05-03"])
+    pages = walk_pages(lambda size, cursor: history_page(hits, size, cursor), 4)
+    assert_walks_newest_first(pages, hits)
@@ -0,0 +1,180 @@
+"""HitJournal batching, partial failures, the in-flight guard and dead-lettering.
+
+flush_fn stubs stand in for storage.insert_hits: they return BigQuery-style
+per-row errors ({"index": ..., "errors": [...]}) or raise.
+"""
+import sqlite3
+import time
+
+import pytest
+
+from hit_journal import MAX_ATTEMPTS, HitJournal
+
+
+def make_rows(count, prefix="hit"):
+    return [{"id": f"{prefix}-{index}", "hitter_name": "Journal Hitter"} for index in range(count)]
+
+
+def row_state(journal):
+    # {id: (attempts, in_flight)} of the rows still pending.
+    with sqlite3.connect(journal.path) as conn:
+        return {hit_id: (attempts, in_flight) for hit_id, attempts, in_flight
+                in conn.execute("SELECT id, attempts, in_flight FROM pending_hits")}
+
+
+def rejecting(bad_ids, reason="invalid"):
+    # Rejects bad_ids; with reason "invalid", the other rows go in.
+    def flush_fn(rows):
+        return [{"index": index, "errors": [{"reason": reason, "message": "bad row"}]}
+                for index, row in enumerate(rows) if row["id"] in bad_ids]
+    return flush_fn
+
+
+@pytest.fixture
+def make_journal(tmp_path):
+    def make(flush_fn, **kwargs):
+        return HitJournal(str(tmp_path / "journal.db"), flush_fn, **kwargs)
+    return make
+
+
+def test_flush_sends_everything_in_batches(make_journal):
+    batches = []
+    journal = make_journal(lambda rows: batches.append([row["id"] for row in rows]), batch_size=3)
+    for row in make_rows(7):
+        journal.append(row)
+    assert journal.flush() == 7
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [hit_id for batch in batches for hit_id in batch] == [f"hit-{index}" for index in range(7)]
+    assert journal.pending_count() == 0
+    assert journal.last_error is None
+
+
+def test_rejected_row_stays_pending_and_is_released(make_journal):
+    journal = make_journal(rejecting({"hit-1"}))
+    for row in make_rows(3):
+        journal.append(row)
+    assert journal.flush() == 2
+    assert row_state(journal) == {"hit-1": (1, 0)}
+    assert "bad row" in journal.last_error
+
+
+def test_whole_request_failure_releases_rows_without_an_attempt(make_journal):
+    def offline(rows):
+        raise ConnectionError("no network")
+    journal = make_journal(offline)
+    for row in make_rows(2):
+        journal.append(row)
+    with pytest.raises(ConnectionError):
+        journal.flush()
+    assert row_state(journal) == {"hit-0": (0, 0), "hit-1": (0, 0)}
+    assert journal.last_error == "no network"
+
+
+def test_stopped_rows_are_retried_without_an_attempt(make_journal):
+    # BigQuery skips the valid rows of a request with an invalid one (reason "stopped").
+    def flush_fn(rows):
+        return [{"index": index, "errors": [{"reason": "invalid" if row["id"] == "hit-0" else "stopped"}]}
+                for index, row in enumerate(rows)]
+    journal = make_journal(flush_fn)
+    for row in make_rows(3):
+        journal.append(row)
+    assert journal.flush() == 0
+    assert row_state(journal) == {"hit-0": (1, 0), "hit-1": (0, 0), "hit-2": (0, 0)}
+
+
+def test_row_is_dead_lettered_after_max_attempts(make_journal):
+    journal = make_journal(rejecting({"hit-0"}))
+    journal.append(make_rows(1)[0])
+    for attempt in range(1, MAX_ATTEMPTS):
+        journal.flush()
+        assert row_state(journal) == {"hit-0": (attempt, 0)}
+        assert journal.dead_count() == 0
+    journal.flush()
+    assert journal.pending_count() == 0
+    assert journal.dead_count() == 1
+    [dead] = journal.dead_rows()
+    assert dead["id"] == "hit-0"
+    assert dead["attempts"] == MAX_ATTEMPTS
+    assert "bad row" in dead["error"]
+
+
+def test_dead_row_no_longer_blocks_the_rows_behind_it(make_journal):
+    bad = {"hit-0"}
+    journal = make_journal(rejecting(bad), batch_size=1)
+    for row in make_rows(3):
+        journal.append(row)
+    for _ in range(MAX_ATTEMPTS):
+        assert journal.flush() == 0
+    assert journal.flush() == 2
+    assert journal.pending_count() == 0
+
+
+def test_discard_drops_a_waiting_row(make_journal):
+    sent = []
+    journal = make_journal(lambda rows: sent.extend(row["id"] for row in rows))
+    for row in make_rows(2):
+        journal.append(row)
+    assert journal.discard("hit-0") is True
+    assert journal.discard("hit-0") is False
+    journal.flush()
+    assert sent == ["hit-1"]
+
+
+def test_discard_leaves_a_row_that_is_being_sent(make_journal):
+    discarded = []
+
+    def flush_fn(rows):
+        # Runs while the batch is in flight, like a delete from another session.
+        discarded.append(journal.discard(rows[0]["id"]))
+    journal = make_journal(flush_fn)
+    journal.append(make_rows(1)[0])
+    assert journal.flush() == 1
+    assert discarded == [False]
+    assert journal.pending_count() == 0
+
+
+def test_discard_works_again_once_a_failed_row_is_released(make_journal):
+    journal = make_journal(rejecting({"hit-0"}))
+    journal.append(make_rows(1)[0])
+    journal.flush()
+    assert journal.discard("hit-0") is True
+    assert journal.pending_count() == 0
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_append_many_wakes_the_writer(make_journal):
+    sent = []
+    journal = make_journal(lambda rows: sent.extend(row["id"] for row in rows), flush_interval=60.0)
+    journal.start()
+    try:
+        journal.append(make_rows(1, prefix="single")[0])
+        time.sleep(0.2)
+        # A single append below batch_size waits for the flush interval...
+        assert sent == []
+        # ...while a batch is flushed right away, along with what was waiting.
+        journal.append_many(make_rows(3))
+        assert wait_until(lambda: len(sent) == 4)
+    finally:
+        journal.stop()
+    assert journal.pending_count() == 0
+
+
+def test_append_wakes_the_writer_at_batch_size(make_journal):
+    sent = []
+    journal = make_journal(lambda rows: sent.extend(row["id"] for row in rows), batch_size=3,
+                           flush_interval=60.0)
+    journal.start()
+    try:
+        for row in make_rows(3):
+            journal.append(row)
+        assert wait_until(lambda: len(sent) == 3)
+    finally:
+        journal.stop()
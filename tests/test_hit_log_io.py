@@ -0,0 +1,151 @@
+"""Row validation, all-or-nothing imports and the Parquet round trip of hit_log_io."""
+import csv
+import operator
+
+import pytest
+
+from field_image import LEGACY_IMAGE_SIZE
+from hit_log_io import export_file, import_files, validate_hit
+from storage import HIT_COLUMNS, LocalStorage
+
+
+def row(**values):
+    base = {"id": "row-1", "date": "2024-04-01", "opponent": "Rivals", "hitter_name": "Ann",
+            "outcome": "Batted Ball", "batted_result": "Single", "contact_type": "Hard Line Drive",
+            "x_coordinate": "0.5", "y_coordinate": "0.3"}
+    base.update(values)
+    return base
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as target:
+        writer = csv.DictWriter(target, fieldnames=HIT_COLUMNS)
+        writer.writeheader()
+        writer.writerows({column: "" if value is None else value for column, value in entry.items()}
+                         for entry in rows)
+    return str(path)
+
+
+def stored_ids(storage):
+    return {entry["id"] for entry in storage.load_hits(None)}
+
+
+def test_valid_row():
+    hit, problems = validate_hit(row())
+    assert problems == []
+    assert list(hit) == HIT_COLUMNS
+    assert (hit["x_coordinate"], hit["y_coordinate"]) == (0.5, 0.3)
+    assert str(hit["date"]) == "2024-04-01"
+
+
+def test_legacy_pixels_are_normalized():
+    hit, problems = validate_hit(row(x_coordinate="180", y_coordinate="90"))
+    assert problems == []
+    assert (hit["x_coordinate"], hit["y_coordinate"]) == (180 / LEGACY_IMAGE_SIZE[0], 90 / LEGACY_IMAGE_SIZE[1])
+
+
+def test_location_outside_the_image():
+    _, problems = validate_hit(row(x_coordinate=str(LEGACY_IMAGE_SIZE[0] * 2), y_coordinate="10"))
+    assert any("outside the field image" in problem for problem in problems)
+
+
+@pytest.mark.parametrize("x, y", [("0.5", None), (None, "0.3")])
+def test_coordinate_without_its_pair(x, y):
+    hit, problems = validate_hit(row(x_coordinate=x, y_coordinate=y))
+    assert problems == ["x_coordinate and y_coordinate must be given together"]
+    assert hit["x_coordinate"] is None and hit["y_coordinate"] is None
+
+
+@pytest.mark.parametrize("details", [
+    {"batted_result": "Single"},
+    {"contact_type": "Weak Fly Ball"},
+    {"x_coordinate": "0.5", "y_coordinate": "0.5"},
+])
+def test_batted_ball_details_on_a_walk(details):
+    values = {"batted_result": None, "contact_type": None, "x_coordinate": None, "y_coordinate": None}
+    values.update(details)
+    _, problems = validate_hit(row(outcome="Walk", **values))
+    assert problems == ["batted ball details given for a Walk"]
+
+
+def test_missing_and_invalid_values():
+    hit, problems = validate_hit(row(id=None, date="04/01/2024", hitter_name=" ", outcome="Bunt"))
+    assert hit["id"]
+    assert "hitter_name is required" in problems
+    assert "date '04/01/2024' is not YYYY-MM-DD" in problems
+    assert any(problem.startswith("outcome 'Bunt'") for problem in problems)
+
+
+def test_import_csv(tmp_path, capsys):
+    storage = LocalStorage(":memory:")
+    path = write_csv(tmp_path / "scorebook.csv", [
+        row(id="a1"),
+        row(id=None, outcome="Walk", batted_result=None, contact_type=None, x_coordinate=None, y_coordinate=None),
+    ])
+    assert import_files(storage, [path]) == 2
+    assert len(stored_ids(storage)) == 2
+    assert "Imported 2 of 2 rows" in capsys.readouterr().out
+
+
+def test_dry_run_imports_nothing(tmp_path):
+    storage = LocalStorage(":memory:")
+    assert import_files(storage, [write_csv(tmp_path / "scorebook.csv", [row()])], dry_run=True) == 0
+    assert stored_ids(storage) == set()
+
+
+def test_one_bad_row_aborts_the_whole_import(tmp_path, capsys):
+    storage = LocalStorage(":memory:")
+    good = write_csv(tmp_path / "good.csv", [row(id=f"good-{index}") for index in range(3)])
+    bad = write_csv(tmp_path / "bad.csv", [row(id="bad-0"), row(id="bad-1", outcome="Bunt")])
+    with pytest.raises(SystemExit):
+        import_files(storage, [good, bad])
+    assert stored_ids(storage) == set()
+    assert f"{bad} row 2: outcome 'Bunt'" in capsys.readouterr().out
+
+
+def test_duplicate_ids_across_files(tmp_path, capsys):
+    storage = LocalStorage(":memory:")
+    first = write_csv(tmp_path / "first.csv", [row(id="same")])
+    second = write_csv(tmp_path / "second.csv", [row(id="other"), row(id="same")])
+    with pytest.raises(SystemExit):
+        import_files(storage, [first, second])
+    assert stored_ids(storage) == set()
+    assert f"{second} row 2: duplicate id same" in capsys.readouterr().out
+
+
+def test_unexpected_columns(tmp_path):
+    path = tmp_path / "extra.csv"
+    path.write_text("id,date,opponent,hitter_name,outcome,pitch_count\nx,2024-04-01,Rivals,Ann,Walk,4\n")
+    with pytest.raises(SystemExit):
+        import_files(LocalStorage(":memory:"), [str(path)])
+
+
+def test_parquet_round_trip(tmp_path):
+    source = LocalStorage(":memory:")
+    rows = [row(id=f"hit-{index}", date=f"2024-04-{index + 1:02d}", x_coordinate=str(index * 30),
+                y_coordinate="45") for index in range(6)]
+    import_files(source, [write_csv(tmp_path / "scorebook.csv", rows)])
+    exported = str(tmp_path / "hits.parquet")
+    assert export_file(source, exported) == 6
+
+    # Re-importing into the same store is a no-op.
+    assert import_files(source, [exported]) == 0
+    # Into another store, everything but a tombstoned id arrives unchanged.
+    target = LocalStorage(":memory:")
+    target.delete_hit("hit-2")
+    assert import_files(target, [exported]) == 5
+    assert stored_ids(target) == stored_ids(source) - {"hit-2"}
+    by_id = operator.itemgetter("id")
+    assert sorted(target.load_hits(None), key=by_id) == [
+        hit for hit in sorted(source.load_hits(None), key=by_id) if hit["id"] != "hit-2"]
+
+
+def test_deleted_rows_stay_deleted_after_compaction(tmp_path):
+    storage = LocalStorage(":memory:")
+    path = write_csv(tmp_path / "scorebook.csv", [row(id=f"hit-{index}") for index in range(3)])
+    assert import_files(storage, [path]) == 3
+    storage.delete_hit("hit-0")
+    # A negative age compacts the tombstone written just now.
+    storage.compact_deleted_hits(min_age_minutes=-1)
+    assert import_files(storage, [path]) == 0
+    assert stored_ids(storage) == {"hit-1", "hit-2"}
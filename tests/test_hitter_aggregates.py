@@ -0,0 +1,132 @@
+"""Rebuilt hitter aggregates must equal the ones maintained incrementally.
+
+rebuild_from() counts with the backend's GROUP BYs (COUNTER_CONDITIONS and
+storage.spray_bins_sql()), add_hits()/remove_hit() with hit_counters() and
+spray_bin(); both are run on the same hits through LocalStorage and compared
+table by table.
+"""
+import random
+import uuid
+
+import pytest
+
+from field_image import LEGACY_IMAGE_SIZE
+from hit_journal import HitJournal
+from hit_outcomes import BATTED_RESULTS, CONTACT_TYPES, OUTCOMES
+from hitter_aggregates import SPRAY_BINS, AggregateStore
+from storage import LocalStorage
+
+HITTERS = ["Agg Hitter A", "Agg Hitter B", "Agg Hitter C"]
+OPPONENTS = ["Rivals", "Visitors", None]
+# Bin edges, the image edge and legacy pixel values, besides random fractions.
+EDGE_POINTS = [(0.0, 0.0), (1.0, 1.0), (1 / SPRAY_BINS, 2 / SPRAY_BINS), (0.5, 0.999999),
+               (float(LEGACY_IMAGE_SIZE[0]), float(LEGACY_IMAGE_SIZE[1])), (180.0, 12.0), (359.0, 1.0)]
+COUNTS_TABLES = {"hitter_counts": "pa", "hitter_game_counts": "pa", "hitter_spray_bins": "hits"}
+
+
+def random_hit(rng):
+    outcome = rng.choice(OUTCOMES)
+    hit = {"id": str(uuid.UUID(int=rng.getrandbits(128))), "date": f"2024-05-{rng.randint(1, 9):02d}",
+           "opponent": rng.choice(OPPONENTS), "hitter_name": rng.choice(HITTERS), "outcome": outcome,
+           "batted_result": None, "contact_type": None, "x_coordinate": None, "y_coordinate": None}
+    if outcome == "Batted Ball":
+        hit["batted_result"] = rng.choice(BATTED_RESULTS + [None])
+        hit["contact_type"] = rng.choice(CONTACT_TYPES + [None])
+        if rng.random() < 0.9:
+            x, y = rng.choice(EDGE_POINTS) if rng.random() < 0.2 else (rng.random(), rng.random())
+            hit["x_coordinate"], hit["y_coordinate"] = x, y
+    return hit
+
+
+def table_rows(store, table):
+    # The table's rows without the all-zero ones incremental removes can leave behind.
+    rows = store._conn.execute(f"SELECT * FROM {table} WHERE {COUNTS_TABLES[table]} != 0").fetchall()
+    return sorted(tuple(row) for row in rows)
+
+
+def assert_same_counts(store, expected):
+    for table in COUNTS_TABLES:
+        assert table_rows(store, table) == table_rows(expected, table), table
+    for hitter in HITTERS:
+        assert store.hitter_totals(hitter) == expected.hitter_totals(hitter)
+        assert store.game_totals(hitter) == expected.game_totals(hitter)
+        for contact_type in [None] + CONTACT_TYPES:
+            assert sorted(store.spray_bins(hitter, contact_type)) == sorted(expected.spray_bins(hitter, contact_type))
+
+
+@pytest.fixture
+def journal(tmp_path):
+    return HitJournal(str(tmp_path / "journal.db"), None)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_rebuild_matches_incremental(seed, journal):
+    rng = random.Random(seed)
+    hits = [random_hit(rng) for _ in range(rng.randint(1, 300))]
+    stored, pending = hits[:len(hits) * 4 // 5], hits[len(hits) * 4 // 5:]
+    storage = LocalStorage(":memory:")
+    storage.insert_hits(stored)
+    deleted = {hit["id"] for hit in rng.sample(stored, len(stored) // 10)}
+    for hit_id in deleted:
+        storage.delete_hit(hit_id)
+    for hit in pending:
+        journal.append(hit)
+
+    rebuilt = AggregateStore(":memory:")
+    rebuilt.rebuild_from(storage, journal)
+    expected = AggregateStore(":memory:")
+    expected.add_hits([hit for hit in hits if hit["id"] not in deleted])
+    assert_same_counts(rebuilt, expected)
+
+
+def test_removing_after_a_rebuild_matches_incremental(journal):
+    rng = random.Random(7)
+    hits = [random_hit(rng) for _ in range(200)]
+    storage = LocalStorage(":memory:")
+    storage.insert_hits(hits)
+    rebuilt = AggregateStore(":memory:")
+    rebuilt.rebuild_from(storage, journal)
+    expected = AggregateStore(":memory:")
+    expected.add_hits(hits)
+    for hit in hits[::9]:
+        rebuilt.remove_hit(hit)
+        expected.remove_hit(hit)
+    assert_same_counts(rebuilt, expected)
+
+
+def test_adding_the_same_id_twice_counts_once():
+    rng = random.Random(11)
+    hits = [random_hit(rng) for _ in range(100)]
+    once, twice = AggregateStore(":memory:"), AggregateStore(":memory:")
+    once.add_hits(hits)
+    twice.add_hits(hits)
+    twice.add_hits(hits[::3])
+    assert_same_counts(twice, once)
+
+
+def test_re_adding_an_edited_row_replaces_it():
+    hit = {"id": "edited", "date": "2024-05-01", "opponent": "Rivals", "hitter_name": HITTERS[0],
+           "outcome": "Batted Ball", "batted_result": "Single", "contact_type": "Hard Line Drive",
+           "x_coordinate": 0.5, "y_coordinate": 0.4}
+    edited = dict(hit, batted_result="Double", x_coordinate=0.2)
+    store, expected = AggregateStore(":memory:"), AggregateStore(":memory:")
+    store.add_hits([hit])
+    store.add_hits([edited])
+    expected.add_hits([edited])
+    assert_same_counts(store, expected)
+
+
+def test_removing_the_same_id_twice_subtracts_once():
+    rng = random.Random(13)
+    hits = [random_hit(rng) for _ in range(100)]
+    once, twice = AggregateStore(":memory:"), AggregateStore(":memory:")
+    once.add_hits(hits)
+    twice.add_hits(hits)
+    for hit in hits[:10]:
+        once.remove_hit(hit)
+        twice.remove_hit(hit)
+        twice.remove_hit(hit)
+    assert_same_counts(twice, once)
+    # Removing it once more still changes nothing.
+    twice.remove_hit(hits[0])
+    assert_same_counts(twice, once)